@@ -1,7 +1,3 @@
-import logging
-import os
-from logging.handlers import RotatingFileHandler
-
 from flask import Flask
 from dotenv import load_dotenv
 from flask_sqlalchemy import SQLAlchemy
@@ -37,42 +33,54 @@ def create_app() -> Flask:
 	login_manager.init_app(app)
 	cache.init_app(app)
 
+	# Logging first, so the request id is assigned before any other hook runs
+	from .logging_utils import setup_logging
+	setup_logging(app)
+
+	from .audit import init_audit
+	init_audit(app)
+	from .passwords import init_passwords
+	init_passwords(app)
+	from .idempotency import init_idempotency
+	init_idempotency(app)
+	from .qr_cache import qr_cache
+	qr_cache.init_app(app)
+	from .realtime import hub
+	hub.init_app(app)
+	from .rollups import init_rollups
+	init_rollups(app)
+	from .db_monitor import sampler
+	sampler.init_app(app)
+	from .metrics import init_metrics
+	init_metrics(app)
+	from .profiling import init_profiling
+	init_profiling(app)
+
 	# Blueprints
 	from .auth import auth_bp
 	from .routes import main_bp
 	app.register_blueprint(auth_bp)
 	app.register_blueprint(main_bp)
 
-	# Logging
-	setup_logging(app)
-
 	# Seed admin
 	with app.app_context():
+		from sqlalchemy import inspect
 		from .models import seed_admin
-		# Ensure tables exist before seeding
-		db.create_all()
+		# Build the current schema only on an empty database (then `flask db
+		# stamp head`); existing ones change through `flask db upgrade` alone,
+		# or a revision would find its tables already there
+		if not inspect(db.engine).has_table("user"):
+			db.create_all()
 		seed_admin()
+	from .usernames import init_usernames
+	init_usernames(app)
 
 	return app
 
 
-def setup_logging(app: Flask) -> None:
-	log_dir = os.path.join(app.instance_path, "logs")
-	os.makedirs(log_dir, exist_ok=True)
-	log_file = os.path.join(log_dir, "app.log")
-	handler = RotatingFileHandler(log_file, maxBytes=2_000_000, backupCount=5)
-	handler.setLevel(logging.INFO)
-	formatter = logging.Formatter(
-		"%(asctime)s %(levelname)s %(name)s %(request_id)s %(message)s"
-	)
-	handler.setFormatter(formatter)
-	app.logger.addHandler(handler)
-	app.logger.setLevel(logging.INFO)
-
-
 @login_manager.user_loader
 def load_user(user_id: str):
-	from .models import User
-	return User.query.get(int(user_id))
+	from .identity import load_identity
+	return load_identity(int(user_id))
 
 
@@ -1,21 +1,198 @@
 from __future__ import annotations
 
-import json
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from flask import Flask, current_app, g, has_request_context
 from flask_login import current_user
+from sqlalchemy import event, insert
 
 from . import db
 from .models import AuditLog
 
+# How an event reaches the audit_log table (Config.AUDIT_MODE):
+#   "transaction" - buffered for the request and inserted by the next commit of
+#                   the business transaction, or in one commit at teardown
+#   "batch"       - handed to a per-worker background writer that does
+#                   multi-row INSERTs; a crash can lose the last unflushed batch
+#   "sync"        - inserted and committed immediately, one commit per event;
+#                   with commit=False the insert joins the caller's transaction
+AUDIT_MODES = ("transaction", "batch", "sync")
+
+_writers: list["AuditWriter"] = []
+
+
+def log_event(action: str, resource: str, meta: str | None = None, commit: bool = True) -> None:
+	_record(action, [resource], meta, commit)
+
+
+def log_events(action: str, resources: list[str], meta: str | None = None, commit: bool = True) -> None:
+	"""log_event for many resources at once, inserted as one multi-row INSERT."""
+	if resources:
+		_record(action, resources, meta, commit)
+
+
+def _record(action: str, resources: list[str], meta: str | None, commit: bool) -> None:
+	# No request (CLI, Celery, scripts) means no acting user
+	authenticated = has_request_context() and current_user.is_authenticated
+	actor_id = current_user.id if authenticated else None
+	actor_username = current_user.username if authenticated else None
+	created_at = datetime.utcnow()
+	rows = [
+		{
+			"action": action,
+			"resource": resource,
+			"actor_id": actor_id,
+			"actor_username": actor_username,
+			"meta": meta,
+			"created_at": created_at,
+		}
+		for resource in resources
+	]
+	mode = current_app.config.get("AUDIT_MODE", "transaction")
+	if mode == "batch":
+		writer = current_app.extensions["audit_writer"]
+		for row in rows:
+			writer.submit(row)
+	elif mode == "transaction" and has_request_context():
+		g.setdefault("_audit_rows", []).extend(rows)
+	else:
+		db.session.execute(insert(AuditLog), rows)
+		if commit:
+			db.session.commit()
+
+
+@event.listens_for(db.session, "before_commit")
+def _write_buffered_events(session) -> None:
+	"""Ride buffered request events on whatever transaction commits first."""
+	if not has_request_context():
+		return
+	rows = g.pop("_audit_rows", None)
+	if rows:
+		session.execute(insert(AuditLog), rows)
+
+
+def _flush_request_events(exc: BaseException | None) -> None:
+	"""Commit events from requests that never committed a business change."""
+	rows = g.pop("_audit_rows", None)
+	if not rows or exc is not None:
+		return
+	try:
+		# Anything the view left uncommitted is discarded at teardown anyway
+		db.session.rollback()
+		db.session.execute(insert(AuditLog), rows)
+		db.session.commit()
+	except Exception:
+		db.session.rollback()
+		current_app.logger.exception("Failed to write %d audit events", len(rows))
+
+
+class AuditWriter:
+	"""Per-worker background writer that drains audit rows in batches.
+	Rows are written every `batch_size` events or `interval_ms` milliseconds,
+	whichever comes first. The thread starts lazily in each forked worker.
+	"""
+
+	def __init__(self, app: Flask, batch_size: int = 100, interval_ms: int = 500) -> None:
+		self.app = app
+		self.batch_size = max(1, batch_size)
+		self.interval = max(1, interval_ms) / 1000.0
+		self._queue: queue.Queue = queue.Queue()
+		self._thread: threading.Thread | None = None
+		self._pid: int | None = None
+		self._lock = threading.Lock()
+		self._stopping = False
+
+	def submit(self, row: dict) -> None:
+		if self._pid != os.getpid():
+			self._start()
+		self._queue.put(row)
+
+	def _start(self) -> None:
+		with self._lock:
+			if self._pid == os.getpid():
+				return
+			# A forked worker must not inherit the parent's queue or thread
+			self._queue = queue.Queue()
+			self._stopping = False
+			self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+			self._pid = os.getpid()
+			self._thread.start()
+
+	def _run(self) -> None:
+		while not self._stopping:
+			batch = self._collect()
+			if batch:
+				self._write(batch)
+
+	def _collect(self) -> list[dict]:
+		batch: list[dict] = []
+		deadline = time.monotonic() + self.interval
+		while len(batch) < self.batch_size:
+			remaining = deadline - time.monotonic()
+			if remaining <= 0:
+				break
+			try:
+				row = self._queue.get(timeout=remaining)
+			except queue.Empty:
+				break
+			if row is None:
+				self._stopping = True
+				break
+			batch.append(row)
+		return batch
+
+	def _write(self, rows: list[dict]) -> None:
+		with self.app.app_context():
+			try:
+				db.session.execute(insert(AuditLog), rows)
+				db.session.commit()
+			except Exception:
+				db.session.rollback()
+				self.app.logger.exception("Failed to write %d audit events", len(rows))
+
+	def flush(self) -> None:
+		"""Synchronously write everything queued so far."""
+		rows: list[dict] = []
+		while True:
+			try:
+				row = self._queue.get_nowait()
+			except queue.Empty:
+				break
+			if row is not None:
+				rows.append(row)
+		for start in range(0, len(rows), self.batch_size):
+			self._write(rows[start:start + self.batch_size])
+
+	def stop(self, timeout: float = 5.0) -> None:
+		if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+			self._queue.put(None)
+			self._thread.join(timeout)
+		self.flush()
+
+
+def shutdown_audit() -> None:
+	"""Flush pending batched events; called on worker exit."""
+	for writer in _writers:
+		writer.stop()
+
 
-def log_event(action: str, resource: str, meta: str | None = None) -> None:
-	audit = AuditLog(
-		action=action,
-		resource=resource,
-		actor_id=(current_user.id if current_user.is_authenticated else None),
-		actor_username=(current_user.username if current_user.is_authenticated else None),
-		meta=meta,
+def init_audit(app: Flask) -> None:
+	mode = app.config.get("AUDIT_MODE", "transaction")
+	if mode not in AUDIT_MODES:
+		raise ValueError(f"AUDIT_MODE must be one of {AUDIT_MODES}, got {mode!r}")
+	writer = AuditWriter(
+		app,
+		batch_size=app.config.get("AUDIT_BATCH_SIZE", 100),
+		interval_ms=app.config.get("AUDIT_FLUSH_INTERVAL_MS", 500),
 	)
-	db.session.add(audit)
-	db.session.commit()
+	app.extensions["audit_writer"] = writer
+	_writers.append(writer)
+	app.teardown_request(_flush_request_events)
 
 
+atexit.register(shutdown_audit)
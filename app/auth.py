@@ -1,10 +1,11 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 
 from . import db
 from .models import User, Role
 from .audit import log_event
+from .passwords import check_password, hash_password
+from .usernames import find_user
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
@@ -20,19 +21,14 @@ def login_page():
 def login_submit():
 	username = request.form.get("username", "").strip()
 	password = request.form.get("password", "")
-	print(f"DEBUG: Login attempt - username: '{username}', password length: {len(password)}")
-	user = User.query.filter_by(username=username).first()
-	print(f"DEBUG: User found: {user is not None}")
-	if not user or not check_password_hash(user.password_hash, password):
-		print(f"DEBUG: Login failed - user exists: {user is not None}")
-		if user:
-			print(f"DEBUG: Password check result: {check_password_hash(user.password_hash, password)}")
+	user = find_user(username)
+	if not user or not check_password(user, password):
+		current_app.logger.info("Login failed", extra={"username": username, "user_exists": user is not None})
 		flash("Invalid credentials", "danger")
 		log_event("auth_login_failed", resource=username)
 		return redirect(url_for("auth.login_page"))
 	login_user(user, remember=True)
-	print(f"DEBUG: Login successful for user: {user.username}")
-	print(f"DEBUG: User authenticated: {user.is_authenticated}")
+	current_app.logger.debug("Login successful", extra={"username": user.username})
 	log_event("auth_login", resource=user.username)
 	return redirect(url_for("main.dashboard"))
 
@@ -51,13 +47,13 @@ def register_submit():
 	if not username or not password:
 		flash("Username and password required", "danger")
 		return redirect(url_for("auth.register_page"))
-	if User.query.filter_by(username=username).first():
+	if find_user(username):
 		flash("Username already exists", "danger")
 		return redirect(url_for("auth.register_page"))
-	user = User(username=username, password_hash=generate_password_hash(password), role=Role.USER)
+	user = User(username=username, password_hash=hash_password(password), role=Role.USER)
 	db.session.add(user)
-	db.session.commit()
 	log_event("auth_register", resource=user.username)
+	db.session.commit()
 	login_user(user)
 	return redirect(url_for("main.dashboard"))
 
@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+import multiprocessing
+
+from flask import current_app
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .audit import log_events
+from .models import User, Role, generate_password_from_name
+from .email_utils import send_credentials_email
+from .passwords import password_hasher
+
+# Accepted header spellings, matched case-insensitively
+EMAIL_HEADERS = ("email", "e-mail", "mail")
+NAME_HEADERS = ("name", "full name", "fullname", "participant name")
+
+
+@dataclass
+class RowResult:
+	username: str | None
+	email: str | None
+	status: str  # "created", "skipped" or "failed"
+	error: str | None = None
+	email_queued: bool = False
+
+
+@dataclass
+class BulkImportResult:
+	rows: list[RowResult] = field(default_factory=list)
+
+	@property
+	def created(self) -> int:
+		return sum(1 for r in self.rows if r.status == "created")
+
+	@property
+	def skipped(self) -> int:
+		return sum(1 for r in self.rows if r.status == "skipped")
+
+	@property
+	def failed(self) -> list[RowResult]:
+		return [r for r in self.rows if r.status == "failed"]
+
+	@property
+	def emails_queued(self) -> int:
+		return sum(1 for r in self.rows if r.email_queued)
+
+
+def iter_upload_rows(upload):
+	"""Yield the rows of an uploaded .xlsx or .csv file one at a time.
+	Workbooks are opened in read-only mode so openpyxl streams the sheet
+	instead of building every cell in memory.
+	"""
+	filename = (upload.filename or "").lower()
+	if filename.endswith(".csv") or upload.mimetype in ("text/csv", "application/csv"):
+		yield from csv.reader(io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline=""))
+		return
+	from openpyxl import load_workbook
+	wb = load_workbook(upload.stream, read_only=True, data_only=True)
+	try:
+		yield from wb.active.iter_rows(values_only=True)
+	finally:
+		wb.close()
+
+
+def read_participants(upload) -> list[dict]:
+	"""Build the bulk-import preview for an uploaded sheet.
+	Existence is resolved for the whole file with chunked IN queries and
+	repeated usernames within the file are flagged as duplicates.
+	Raises ValueError when the file has no email column.
+	"""
+	rows = iter_upload_rows(upload)
+	header_row = next(rows, None) or ()
+	# Build a lookup like {'email': idx, 'name': idx}
+	header_to_index = {}
+	for idx, header_value in enumerate(header_row):
+		if header_value is None:
+			continue
+		header_to_index[str(header_value).strip().lower()] = idx
+	email_idx = next((header_to_index[h] for h in EMAIL_HEADERS if h in header_to_index), None)
+	name_idx = next((header_to_index[h] for h in NAME_HEADERS if h in header_to_index), None)
+	if email_idx is None:
+		raise ValueError("Could not find 'email' column in the uploaded file.")
+
+	participants = []
+	seen: set[str] = set()
+	for row in rows:
+		email = row[email_idx] if email_idx < len(row) else None
+		name = row[name_idx] if (name_idx is not None and name_idx < len(row)) else None
+
+		# Skip rows without email
+		if not email:
+			continue
+		email = str(email).strip()
+
+		# Derive username: prefer cleaned name; fallback to email local-part
+		if name:
+			username = str(name).strip().replace(" ", "").lower()
+		else:
+			username = email.split("@")[0].strip().replace(" ", "").lower()
+
+		participants.append({
+			'name': name,
+			'email': email,
+			'username': username,
+			'password': generate_password_from_name(username),
+			'exists': False,
+			'duplicate': username in seen,
+		})
+		seen.add(username)
+
+	chunk_size = current_app.config.get("BULK_IMPORT_CHUNK_SIZE", 500)
+	existing = _existing_values(func.lower(User.username), list(seen), chunk_size)
+	for participant in participants:
+		participant['exists'] = participant['username'] in existing
+	return participants
+
+
+def _write_qr_file(path: str, payload: str) -> None:
+	from .wallet import render_qr_png
+	with open(path, "wb") as fh:
+		fh.write(render_qr_png(payload))
+
+
+def _chunks(items: list, size: int):
+	for start in range(0, len(items), size):
+		yield items[start:start + size]
+
+
+def _parallel_map(pool: ProcessPoolExecutor | None, fn, *iterables) -> list:
+	"""Map on the process pool, falling back to this process if it is unusable."""
+	if pool is not None:
+		try:
+			return list(pool.map(fn, *iterables, chunksize=16))
+		except (BrokenProcessPool, OSError):
+			current_app.logger.warning("Process pool unavailable, continuing serially")
+	return [fn(*args) for args in zip(*iterables)]
+
+
+def _existing_values(column, values: list[str], chunk_size: int) -> set[str]:
+	found: set[str] = set()
+	for chunk in _chunks(values, chunk_size):
+		found.update(db.session.execute(select(column).where(column.in_(chunk))).scalars())
+	return found
+
+
+def _insert_users(rows: list[dict]) -> tuple[dict[str, int], dict[str, str]]:
+	"""Multi-row INSERT one chunk; on a constraint error retry row by row so
+	one bad row cannot sink its neighbours. Returns ({username: id}, {username: error}).
+	"""
+	stmt = insert(User).returning(User.id, User.username)
+	try:
+		with db.session.begin_nested():
+			return {name: user_id for user_id, name in db.session.execute(stmt, rows)}, {}
+	except IntegrityError:
+		pass
+	inserted: dict[str, int] = {}
+	errors: dict[str, str] = {}
+	for row in rows:
+		try:
+			with db.session.begin_nested():
+				user_id, name = db.session.execute(stmt, [row]).one()
+				inserted[name] = user_id
+		except IntegrityError as e:
+			errors[row["username"]] = str(e.orig).splitlines()[0]
+	return inserted, errors
+
+
+def _enqueue_emails(rows: list[RowResult], passwords: dict[str, str], chunk_size: int) -> None:
+	try:
+		from .celery_app import send_email_batch
+	except ImportError:
+		# Fallback to synchronous email if Celery not available
+		for row in rows:
+			try:
+				send_credentials_email(row.email, row.username, passwords[row.username])
+				row.email_queued = True
+			except Exception as e:
+				row.error = f"Failed to send email: {e}"
+		return
+	for chunk in _chunks(rows, chunk_size):
+		messages = [(r.email, r.username, passwords[r.username]) for r in chunk]
+		try:
+			send_email_batch.delay(messages)
+		except Exception as e:
+			for row in chunk:
+				row.error = f"Failed to queue email: {e}"
+			continue
+		for row in chunk:
+			row.email_queued = True
+
+
+def create_participants(participants: list[dict]) -> BulkImportResult:
+	"""Create user accounts for a previewed bulk import.
+	Passwords are hashed and QR files rendered on a process pool, users are
+	inserted with multi-row INSERTs per chunk, the qr_generated audit events
+	go in with the qr_filename update and credential emails are enqueued one
+	task per chunk. Failures are reported per row; the rest of
+	the batch still goes through.
+	"""
+	config = current_app.config
+	chunk_size = config.get("BULK_IMPORT_CHUNK_SIZE", 500)
+	result = BulkImportResult()
+
+	pending: list[dict] = []
+	seen: set[str] = set()
+	for p in participants:
+		username = (p.get("username") or "").strip()
+		email = (p.get("email") or "").strip() or None
+		if p.get("exists"):
+			result.rows.append(RowResult(username, email, "skipped", "already exists"))
+		elif p.get("duplicate"):
+			result.rows.append(RowResult(username, email, "skipped", "duplicate username in this import"))
+		elif not username or not p.get("password"):
+			result.rows.append(RowResult(username or None, email, "failed", "missing username or password"))
+		elif username in seen:
+			result.rows.append(RowResult(username, email, "failed", "duplicate username in this import"))
+		else:
+			seen.add(username)
+			pending.append({"username": username, "email": email, "password": p["password"]})
+
+	# The preview may be stale: re-check the whole batch with chunked IN queries
+	# Usernames are compared case-insensitively (see usernames.py); imported ones are lowercase
+	taken_names = _existing_values(func.lower(User.username), [p["username"].lower() for p in pending], chunk_size)
+	taken_emails = _existing_values(User.email, [p["email"] for p in pending if p["email"]], chunk_size)
+	fresh = []
+	for p in pending:
+		if p["username"].lower() in taken_names:
+			result.rows.append(RowResult(p["username"], p["email"], "skipped", "already exists"))
+		elif p["email"] in taken_emails:
+			result.rows.append(RowResult(p["username"], p["email"], "failed", "email already registered"))
+		else:
+			fresh.append(p)
+	if not fresh:
+		return result
+
+	workers = config.get("BULK_IMPORT_WORKERS") or os.cpu_count() or 1
+	pool = None
+	if workers > 1 and len(fresh) > 1:
+		try:
+			# spawn: forking a gevent worker's hub into children is not safe
+			pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+		except OSError:
+			pool = None
+	try:
+		hashes = _parallel_map(pool, password_hasher(), [p["password"] for p in fresh])
+
+		created: dict[str, int] = {}
+		for chunk in _chunks(list(zip(fresh, hashes)), chunk_size):
+			rows = [
+				{"username": p["username"], "email": p["email"], "password_hash": h, "role": Role.USER, "balance": 0}
+				for p, h in chunk
+			]
+			inserted, errors = _insert_users(rows)
+			db.session.commit()
+			created.update(inserted)
+			for p, _ in chunk:
+				if p["username"] in inserted:
+					result.rows.append(RowResult(p["username"], p["email"], "created"))
+				else:
+					result.rows.append(RowResult(p["username"], p["email"], "failed", errors.get(p["username"])))
+
+		qr_dir = os.path.join(current_app.root_path, "static", "qr_codes")
+		os.makedirs(qr_dir, exist_ok=True)
+		names = list(created)
+		_parallel_map(pool, _write_qr_file, [os.path.join(qr_dir, f"{created[n]}.png") for n in names], names)
+	finally:
+		if pool is not None:
+			pool.shutdown()
+
+	for chunk in _chunks(names, chunk_size):
+		db.session.execute(update(User), [{"id": created[n], "qr_filename": f"{created[n]}.png"} for n in chunk])
+		log_events("qr_generated", chunk, commit=False)
+	db.session.commit()
+
+	passwords = {p["username"]: p["password"] for p in fresh}
+	to_email = [r for r in result.rows if r.status == "created" and r.email]
+	_enqueue_emails(to_email, passwords, chunk_size)
+	return result
@@ -0,0 +1,151 @@
+"""
+Key helpers on top of the Flask-Caching backend (Config.CACHE_TYPE).
+
+Per-user entries are namespaced under a generation token:
+
+	u<user_id>:<generation>:<name>
+
+invalidate_user() swaps the token, which orphans every entry for that user
+at once on every worker sharing the backend; orphans age out by TTL. Tokens
+are random rather than counters so two concurrent invalidations can never
+land on the same value and let a stale entry back in. A token the backend
+evicted is replaced by a fresh random one, never by a fixed default, for the
+same reason.
+
+get_or_compute() wraps get/set with single-flight recomputation and early
+refresh so an expired or invalidated hot key is rebuilt once, not by every
+request that sees it missing.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import random
+import secrets
+import time
+
+from . import cache
+from .metrics import record_cache_event
+
+# Flask-Caching backends that live inside one process
+_PRIVATE_BACKENDS = {"simple", "simplecache", "null", "nullcache"}
+
+# Seconds a recompute may hold a key's lock before waiters give up on it
+LOCK_TIMEOUT = 5
+LOCK_POLL_INTERVAL = 0.01
+
+
+def cache_is_shared(cache_type: str) -> bool:
+	"""Whether CACHE_TYPE names a backend all workers see (invalidations reach every worker)."""
+	name = cache_type.rsplit(".", 1)[-1].lower()
+	return name not in _PRIVATE_BACKENDS
+
+
+def _generation_key(user_id: int) -> str:
+	return f"gen:u{user_id}"
+
+
+def current_generation(key: str) -> str:
+	"""The generation token stored at `key`, starting a new one if it is missing."""
+	token = cache.get(key)
+	if token is None:
+		# Missing may mean evicted: reusing an earlier token could revive
+		# entries cached under it, so only a value never seen before is safe
+		token = secrets.token_hex(8)
+		# add() lets concurrent starters agree on whichever token landed first
+		cache.add(key, token, timeout=0)
+		token = cache.get(key) or token
+	return token
+
+
+def user_generation(user_id: int) -> str:
+	return current_generation(_generation_key(user_id))
+
+
+def user_key(user_id: int, name: str) -> str:
+	"""Cache key for `name` in the user's current generation."""
+	return f"u{user_id}:{user_generation(user_id)}:{name}"
+
+
+def invalidate_user(user_id: int) -> None:
+	"""Drop every cached entry for the user, on every worker sharing the cache."""
+	cache.set(_generation_key(user_id), secrets.token_hex(8), timeout=0)
+
+
+# Per-process counters for get_or_compute
+counters = {"hits": 0, "misses": 0, "coalesced": 0, "early_refreshes": 0, "lock_timeouts": 0}
+
+
+def _count(result: str) -> None:
+	counters[result] += 1
+	record_cache_event(result)
+
+
+def _store(key: str, value, timeout: int, started: float) -> None:
+	now = time.time()
+	cache.set(key, {"value": value, "delta": now - started, "expires": now + timeout}, timeout=timeout)
+
+
+def get_or_compute(key: str, compute, timeout: int, beta: float = 1.0):
+	"""Cached value of `key`, computed by `compute()` on a miss.
+
+	Single flight: on a miss only the caller that wins a short lock (cache.add)
+	recomputes; the others poll for its result instead of all hitting the
+	database at once. Hits shortly before expiry refresh early with a
+	probability that grows as expiry nears, scaled by how long the value took
+	to compute (XFetch), so hot keys are rarely seen expired at all.
+	A None result is returned but never cached.
+	"""
+	entry = cache.get(key)
+	if entry is not None:
+		# -log(random()) is exponentially distributed: usually small, occasionally large
+		if time.time() - entry["delta"] * beta * math.log(1.0 - random.random()) < entry["expires"]:
+			_count("hits")
+			return entry["value"]
+		if not cache.add(f"lock:{key}", 1, timeout=LOCK_TIMEOUT):
+			# Someone else is already refreshing; the current value is still good
+			_count("hits")
+			return entry["value"]
+		_count("early_refreshes")
+		return _compute_and_release(key, compute, timeout)
+
+	_count("misses")
+	if cache.add(f"lock:{key}", 1, timeout=LOCK_TIMEOUT):
+		return _compute_and_release(key, compute, timeout)
+
+	deadline = time.monotonic() + LOCK_TIMEOUT
+	while time.monotonic() < deadline:
+		time.sleep(LOCK_POLL_INTERVAL)
+		entry = cache.get(key)
+		if entry is not None:
+			_count("coalesced")
+			return entry["value"]
+	# The lock holder died or is stuck; compute without it
+	_count("lock_timeouts")
+	started = time.time()
+	value = compute()
+	if value is not None:
+		_store(key, value, timeout, started)
+	return value
+
+
+def _compute_and_release(key: str, compute, timeout: int):
+	started = time.time()
+	try:
+		value = compute()
+		if value is not None:
+			_store(key, value, timeout, started)
+		return value
+	finally:
+		cache.delete(f"lock:{key}")
+
+
+def cache_stats() -> dict:
+	lookups = counters["hits"] + counters["misses"]
+	return {
+		"pid": os.getpid(),
+		"backend": type(cache.cache).__name__,
+		"hit_ratio": counters["hits"] / lookups if lookups else None,
+		**counters,
+	}
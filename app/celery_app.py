@@ -33,3 +33,44 @@ def send_email_async(to_email, username, password):
         return f"Email sent successfully to {to_email}"
     except Exception as e:
         return f"Failed to send email to {to_email}: {str(e)}"
+
+@celery.task
+def send_email_batch(messages):
+    """Send a chunk of credential emails; one task per bulk-import chunk"""
+    from .email_utils import send_credentials_email
+    results = []
+    for to_email, username, password in messages:
+        try:
+            send_credentials_email(to_email, username, password)
+            results.append(f"Email sent successfully to {to_email}")
+        except Exception as e:
+            results.append(f"Failed to send email to {to_email}: {str(e)}")
+    return results
+
+_flask_app = None
+
+def _get_flask_app():
+    """The app for tasks that need the database; created once per worker process"""
+    global _flask_app
+    if _flask_app is None:
+        from . import create_app
+        _flask_app = create_app()
+    return _flask_app
+
+@celery.task
+def purge_idempotency_keys():
+    """Delete expired idempotency keys (run by celery beat)"""
+    from . import db
+    from .idempotency import purge_expired_keys
+    with _get_flask_app().app_context():
+        removed = purge_expired_keys()
+        db.session.commit()
+    return removed
+
+# `celery -A app.celery_app beat` runs the purge every IDEMPOTENCY_PURGE_INTERVAL seconds
+celery.conf.beat_schedule = {
+    'purge-idempotency-keys': {
+        'task': purge_idempotency_keys.name,
+        'schedule': float(os.environ.get('IDEMPOTENCY_PURGE_INTERVAL', 3600)),
+    },
+}
@@ -0,0 +1,126 @@
+"""
+Background sampler behind the admin database monitor.
+
+Each worker samples database size, connection counts and table sizes every
+DB_MONITOR_INTERVAL seconds through the application's engine and keeps the
+last DB_MONITOR_HISTORY samples in memory. The monitor page and its polling
+API read from that buffer, so they never open connections of their own, and
+the history doubles as the data for the trend chart.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+
+from flask import Flask
+from sqlalchemy import func, select, text
+
+from . import db
+
+
+def format_bytes(size: int | None) -> str:
+	if size is None:
+		return "Unknown"
+	for unit in ("bytes", "kB", "MB", "GB"):
+		if size < 1024 or unit == "GB":
+			return f"{size:.0f} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+		size /= 1024
+
+
+def _sample_postgresql(conn) -> dict:
+	db_size = conn.execute(text("SELECT pg_database_size(current_database())")).scalar()
+	total, active, idle = conn.execute(text(
+		"""
+		SELECT count(*),
+		       count(*) FILTER (WHERE state = 'active'),
+		       count(*) FILTER (WHERE state = 'idle')
+		FROM pg_stat_activity
+		WHERE datname = current_database()
+		"""
+	)).one()
+	tables = conn.execute(text(
+		"""
+		SELECT relname, pg_total_relation_size(relid), n_live_tup
+		FROM pg_stat_user_tables
+		ORDER BY pg_total_relation_size(relid) DESC
+		"""
+	)).all()
+	return {
+		"db_size_bytes": db_size,
+		"connections": {"total": total, "active": active, "idle": idle},
+		"tables": [{"name": name, "size_bytes": size, "rows": rows} for name, size, rows in tables],
+	}
+
+
+def _sample_sqlite(conn) -> dict:
+	# Development databases: file size only, SQLite has no connection catalog
+	page_count = conn.execute(text("PRAGMA page_count")).scalar()
+	page_size = conn.execute(text("PRAGMA page_size")).scalar()
+	return {"db_size_bytes": page_count * page_size, "connections": None, "tables": []}
+
+
+class DatabaseSampler:
+	"""Samples the database on a daemon thread into a fixed-size ring buffer."""
+
+	def __init__(self) -> None:
+		self.app: Flask | None = None
+		self.interval = 60.0
+		self.samples: deque[dict] = deque(maxlen=120)
+		self._lock = threading.Lock()
+		self._started_pid: int | None = None
+
+	def init_app(self, app: Flask) -> None:
+		self.app = app
+		self.interval = float(app.config.get("DB_MONITOR_INTERVAL", 60))
+		self.samples = deque(maxlen=max(1, app.config.get("DB_MONITOR_HISTORY", 120)))
+		self._started_pid = None
+		app.extensions["db_monitor"] = self
+		app.before_request(self.ensure_started)
+
+	def ensure_started(self) -> None:
+		"""Start this worker's sampling thread on its first request, so a
+		preloading gunicorn master never owns a thread its children lose."""
+		if self.interval <= 0 or self._started_pid == os.getpid():
+			return
+		with self._lock:
+			if self._started_pid == os.getpid():
+				return
+			self._started_pid = os.getpid()
+			threading.Thread(target=self._run, name="db-monitor-sampler", daemon=True).start()
+
+	def _run(self) -> None:
+		while True:
+			with self.app.app_context():
+				self.collect()
+			time.sleep(self.interval)
+
+	def collect(self) -> dict:
+		"""Take one sample now and append it to the buffer; call in an app context."""
+		from .models import User
+		sample = {"timestamp": time.time()}
+		try:
+			with db.engine.connect() as conn:
+				if conn.dialect.name == "postgresql":
+					sample.update(_sample_postgresql(conn))
+				else:
+					sample.update(_sample_sqlite(conn))
+				sample["user_count"] = conn.execute(select(func.count(User.id))).scalar()
+		except Exception as e:
+			sample["error"] = str(e)
+		self.samples.append(sample)
+		return sample
+
+	def latest(self) -> dict:
+		"""Most recent sample, taking one if this worker has none yet (or sampling is off)."""
+		if not self.samples or self.interval <= 0:
+			return self.collect()
+		return self.samples[-1]
+
+	def history(self) -> list[dict]:
+		return list(self.samples)
+
+
+sampler = DatabaseSampler()
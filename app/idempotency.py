@@ -0,0 +1,164 @@
+"""
+Idempotency keys for the balance routes.
+
+A client that may retry, such as a phone on flaky venue Wi-Fi, sends an
+`Idempotency-Key` header or an `idempotency_key` form field (the dashboards
+render a fresh one into each balance form). The first request with a key
+stores its result in IdempotencyKey, in the same transaction as the balance
+change. A retry with the same key from the same user gets that result back
+without touching User or WalletTransaction. Recent results are also kept in
+the shared cache, so most replays skip the database too. Reusing a key for a
+different request is rejected.
+
+Keys expire after IDEMPOTENCY_KEY_TTL seconds. `flask idempotency purge`
+or the Celery beat task deletes expired rows.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask import Flask, current_app, request
+from flask_login import current_user
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from . import cache, db
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+FORM_FIELD = "idempotency_key"
+_VALID_KEY = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+def new_key() -> str:
+	"""A fresh key to render into a form."""
+	return uuid.uuid4().hex
+
+
+def _fingerprint() -> str:
+	"""Hash of what the request asks for, so a reused key can be told apart from a retry."""
+	if request.is_json:
+		payload = request.get_data()
+	else:
+		payload = json.dumps(sorted((k, v) for k, v in request.form.items(multi=True) if k != FORM_FIELD)).encode()
+	return hashlib.sha256(request.endpoint.encode() + b"\0" + payload).hexdigest()
+
+
+class Idempotency:
+	"""One keyed request. `replay` holds the stored response body when the key
+	was seen before; otherwise commit() stores the new result with the change.
+	"""
+
+	def __init__(self, key: str) -> None:
+		self.key = key
+		self.request_hash = _fingerprint()
+		self.replay: dict | None = None
+		self.status_code = 200
+
+	@property
+	def cache_key(self) -> str:
+		return f"idem:{current_user.id}:{self.key}"
+
+	def _load(self) -> dict | None:
+		stored = cache.get(self.cache_key)
+		if stored is not None:
+			return stored
+		row = db.session.execute(
+			select(IdempotencyKey).where(
+				IdempotencyKey.user_id == current_user.id,
+				IdempotencyKey.key == self.key,
+				IdempotencyKey.expires_at > datetime.utcnow(),
+			)
+		).scalar_one_or_none()
+		if row is None:
+			return None
+		stored = {"request_hash": row.request_hash, "status_code": row.status_code, "body": json.loads(row.response)}
+		cache.set(self.cache_key, stored, timeout=self._cache_ttl())
+		return stored
+
+	def _cache_ttl(self) -> int:
+		return min(current_app.config.get("IDEMPOTENCY_KEY_TTL", 86400), current_app.config.get("IDEMPOTENCY_CACHE_TTL", 600))
+
+	def _use(self, stored: dict) -> None:
+		if stored["request_hash"] != self.request_hash:
+			raise ValueError("This idempotency key was already used for a different request")
+		self.replay = stored["body"]
+		self.status_code = stored["status_code"]
+
+	def commit(self, body: dict, status_code: int = 200) -> bool:
+		"""Store `body` alongside the pending change and commit both.
+		Returns False when a concurrent request with the same key committed
+		first; the pending change is then rolled back and `replay` holds the
+		winner's result.
+		"""
+		ttl = current_app.config.get("IDEMPOTENCY_KEY_TTL", 86400)
+		now = datetime.utcnow()
+		# An expired row that has not been purged yet would block the insert
+		db.session.execute(delete(IdempotencyKey).where(
+			IdempotencyKey.user_id == current_user.id,
+			IdempotencyKey.key == self.key,
+			IdempotencyKey.expires_at <= now,
+		))
+		db.session.add(IdempotencyKey(
+			user_id=current_user.id,
+			key=self.key,
+			endpoint=request.endpoint,
+			request_hash=self.request_hash,
+			status_code=status_code,
+			response=json.dumps(body),
+			created_at=now,
+			expires_at=now + timedelta(seconds=ttl),
+		))
+		try:
+			db.session.commit()
+		except IntegrityError:
+			db.session.rollback()
+			stored = self._load()
+			if stored is None:
+				raise
+			self._use(stored)
+			return False
+		cache.set(self.cache_key, {"request_hash": self.request_hash, "status_code": status_code, "body": body}, timeout=self._cache_ttl())
+		return True
+
+
+def begin_idempotent() -> Idempotency | None:
+	"""The request's idempotency key, with any stored result loaded.
+	None when the request has no key. Raises ValueError for a malformed key
+	or one reused for a different request.
+	"""
+	key = request.headers.get(HEADER) or request.form.get(FORM_FIELD)
+	if not key:
+		return None
+	if not _VALID_KEY.match(key):
+		raise ValueError("Invalid idempotency key")
+	idem = Idempotency(key)
+	stored = idem._load()
+	if stored is not None:
+		idem._use(stored)
+	return idem
+
+
+def purge_expired_keys(now: datetime | None = None) -> int:
+	"""Delete expired keys; does not commit. Returns the number removed."""
+	result = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= (now or datetime.utcnow())))
+	return result.rowcount or 0
+
+
+def init_idempotency(app: Flask) -> None:
+	@app.cli.group("idempotency")
+	def idempotency_cli():
+		"""Idempotency keys for balance requests."""
+
+	@idempotency_cli.command("purge")
+	def purge_command():
+		"""Delete expired idempotency keys."""
+		removed = purge_expired_keys()
+		db.session.commit()
+		click.echo(f"Deleted {removed} expired idempotency keys")
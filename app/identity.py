@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from flask import current_app
+from flask_login import UserMixin
+
+from . import db
+from .caching import cache_is_shared, get_or_compute, user_key
+from .models import User, Role
+
+# Fields request handlers and templates read from current_user
+IDENTITY_FIELDS = ("id", "username", "email", "role", "balance", "qr_filename")
+
+
+class CachedIdentity(UserMixin):
+	"""Detached, read-only stand-in for User used as current_user.
+	Anything that needs to write must load the User row itself.
+	"""
+
+	def __init__(self, id: int, username: str, email: str | None, role: str, balance: int, qr_filename: str | None) -> None:
+		self.id = id
+		self.username = username
+		self.email = email
+		self.role = Role(role)
+		self.balance = balance
+		self.qr_filename = qr_filename
+
+	def get_id(self) -> str:
+		return str(self.id)
+
+	def __repr__(self) -> str:
+		return f"<CachedIdentity {self.id} {self.username}>"
+
+
+def _identity_data(user_id: int) -> dict | None:
+	user = db.session.get(User, user_id)
+	if user is None:
+		return None
+	data = {name: getattr(user, name) for name in IDENTITY_FIELDS}
+	data["role"] = user.role.value
+	return data
+
+
+def load_identity(user_id: int):
+	ttl = current_app.config.get("IDENTITY_CACHE_TTL", 30)
+	# A per-process cache would keep a demoted or deleted user's old role on
+	# every worker but the one that made the change
+	if ttl <= 0 or not cache_is_shared(current_app.config.get("CACHE_TYPE", "simple")):
+		return db.session.get(User, user_id)
+	# Keyed by generation: a reader that raced a write can only ever store
+	# under the old, now-unreachable generation (see caching.invalidate_user)
+	data = get_or_compute(user_key(user_id, "identity"), lambda: _identity_data(user_id), ttl)
+	return CachedIdentity(**data) if data is not None else None
@@ -0,0 +1,168 @@
+"""
+Non-blocking, structured application logging.
+
+Request threads only put records on an in-memory queue (PidQueueHandler);
+a QueueListener thread per process formats them and does the I/O, so a
+slow disk or pipe never stalls a request. Under gevent the listener is a
+greenlet, so the write happens once the request yields instead of inline.
+
+Every record carries the request id, taken from an incoming X-Request-ID
+header or generated, and echoed back on the response so a log line can be
+matched to the request that wrote it.
+
+Config: LOG_LEVEL, LOG_FORMAT ("json" or "text") and LOG_FILE (a rotating
+file in addition to stderr; empty to disable).
+"""
+
+from __future__ import annotations
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import Flask, g, has_request_context, request
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+	"""One JSON object per line, with any `extra=` fields included."""
+
+	def format(self, record: logging.LogRecord) -> str:
+		entry = {
+			"ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+			"level": record.levelname,
+			"logger": record.name,
+			"message": record.getMessage(),
+			"request_id": getattr(record, "request_id", None),
+			"pid": record.process,
+		}
+		for key, value in record.__dict__.items():
+			if key not in _RECORD_FIELDS and not key.startswith("_"):
+				entry[key] = value
+		if record.exc_info and not record.exc_text:
+			record.exc_text = self.formatException(record.exc_info)
+		if record.exc_text:
+			entry["exception"] = record.exc_text
+		return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+	"""Stamps records with the current request's id ("-" outside requests)."""
+
+	def filter(self, record: logging.LogRecord) -> bool:
+		record.request_id = g.get("request_id", "-") if has_request_context() else "-"
+		return True
+
+
+class PidQueueHandler(QueueHandler):
+	"""QueueHandler that (re)starts its listener in whichever process logs.
+	A preloading gunicorn master forks workers without the listener thread,
+	so each worker starts its own on first use.
+	"""
+
+	def __init__(self, handlers: list[logging.Handler]) -> None:
+		super().__init__(queue.SimpleQueue())
+		self.handlers = handlers
+		self._listener: QueueListener | None = None
+		self._listener_pid: int | None = None
+		self._start_lock = threading.Lock()
+
+	def _ensure_listener(self) -> None:
+		if self._listener_pid == os.getpid():
+			return
+		with self._start_lock:
+			if self._listener_pid == os.getpid():
+				return
+			self.queue = queue.SimpleQueue()  # records queued before a fork belong to the parent
+			self._listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+			self._listener.start()
+			self._listener_pid = os.getpid()
+
+	def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+		# Unlike the default, keep the traceback apart from the message so
+		# the JSON formatter can put it in its own field
+		record = copy.copy(record)
+		record.msg = record.getMessage()
+		record.args = None
+		if record.exc_info:
+			record.exc_text = logging.Formatter().formatException(record.exc_info)
+			record.exc_info = None
+		return record
+
+	def enqueue(self, record: logging.LogRecord) -> None:
+		self._ensure_listener()
+		self.queue.put_nowait(record)
+
+	def stop(self) -> None:
+		"""Flush queued records; call at process exit."""
+		if self._listener is not None and self._listener_pid == os.getpid():
+			self._listener.stop()
+			self._listener_pid = None
+
+
+_queue_handlers: list[PidQueueHandler] = []
+
+
+def shutdown_logging() -> None:
+	"""Write out queued records; called on worker exit."""
+	for handler in _queue_handlers:
+		handler.stop()
+
+
+atexit.register(shutdown_logging)
+
+
+def _assign_request_id() -> None:
+	incoming = request.headers.get(REQUEST_ID_HEADER, "")
+	g.request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+
+
+def _echo_request_id(response):
+	request_id = g.get("request_id")
+	if request_id:
+		response.headers[REQUEST_ID_HEADER] = request_id
+	return response
+
+
+def setup_logging(app: Flask) -> None:
+	level = logging.getLevelName(str(app.config.get("LOG_LEVEL", "INFO")).upper())
+	if not isinstance(level, int):
+		level = logging.INFO
+	if app.config.get("LOG_FORMAT", "json") == "json":
+		formatter = JsonFormatter()
+	else:
+		formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s %(request_id)s %(message)s")
+
+	handlers: list[logging.Handler] = [logging.StreamHandler()]
+	log_file = app.config.get("LOG_FILE")
+	if log_file is None:
+		log_file = os.path.join(app.instance_path, "logs", "app.log")
+	if log_file:
+		os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+		handlers.append(RotatingFileHandler(log_file, maxBytes=2_000_000, backupCount=5))
+	for handler in handlers:
+		handler.setFormatter(formatter)
+
+	queue_handler = PidQueueHandler(handlers)
+	queue_handler.addFilter(RequestIdFilter())
+	app.logger.handlers.clear()
+	app.logger.addHandler(queue_handler)
+	app.logger.setLevel(level)
+	app.logger.propagate = False
+	_queue_handlers.append(queue_handler)
+
+	app.before_request(_assign_request_id)
+	app.after_request(_echo_request_id)
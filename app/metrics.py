@@ -0,0 +1,192 @@
+"""
+Prometheus metrics, served at /metrics (optional: needs prometheus_client).
+
+Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+(set in gunicorn.conf.py) and /metrics aggregates all of them, whichever
+worker answers the scrape. Without that variable each process reports only
+its own numbers, which is what `python wsgi.py` and the benchmarks get.
+
+Recording is a few dict lookups and an mmap write per event, cheap enough
+to leave on; set METRICS_ENABLED=0 to skip the request hooks entirely.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+from flask import Flask, Response, current_app, g, request
+from sqlalchemy import event
+
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+	# prometheus_client opens its sample files as soon as the first metric is defined
+	os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+try:
+	import prometheus_client
+	from prometheus_client import Counter, Gauge, Histogram
+except ImportError:
+	prometheus_client = None
+
+from . import db
+
+if prometheus_client is not None:
+	REQUEST_LATENCY = Histogram(
+		"wallet_http_request_duration_seconds",
+		"Request latency by blueprint endpoint",
+		["endpoint", "method"],
+	)
+	REQUESTS = Counter(
+		"wallet_http_requests_total",
+		"Responses by blueprint endpoint and status code",
+		["endpoint", "method", "status"],
+	)
+	POOL_CHECKED_OUT = Gauge(
+		"wallet_db_pool_checked_out",
+		"Database connections currently checked out of the pool",
+		multiprocess_mode="livesum",
+	)
+	POOL_OVERFLOW = Gauge(
+		"wallet_db_pool_overflow",
+		"Connections open beyond pool_size (negative while the pool is not full)",
+		multiprocess_mode="livesum",
+	)
+	POOL_WAIT = Histogram(
+		"wallet_db_pool_wait_seconds",
+		"Time to obtain a connection from the pool, including opening a new one",
+		buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+	)
+	CACHE_EVENTS = Counter(
+		"wallet_cache_lookups_total",
+		"Cached reads by outcome (hit ratio = hits / (hits + misses))",
+		["result"],
+	)
+	SSE_CONNECTIONS = Gauge(
+		"wallet_sse_connections",
+		"Open real-time balance (SSE) connections",
+		multiprocess_mode="livesum",
+	)
+	CELERY_ENQUEUE = Histogram(
+		"wallet_celery_enqueue_seconds",
+		"Time to publish a Celery task to the broker",
+		["task"],
+		buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+	)
+
+
+def record_cache_event(result: str) -> None:
+	if prometheus_client is not None:
+		CACHE_EVENTS.labels(result).inc()
+
+
+def record_sse_connections(change: int) -> None:
+	if prometheus_client is not None:
+		SSE_CONNECTIONS.inc(change)
+
+
+def _endpoint() -> str:
+	return request.url_rule.endpoint if request.url_rule is not None else "<unmatched>"
+
+
+def _start_timer() -> None:
+	g._metrics_started = time.perf_counter()
+
+
+def _record_response(response):
+	started = g.pop("_metrics_started", None)
+	if started is not None:
+		endpoint = _endpoint()
+		REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - started)
+		REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+	return response
+
+
+def _record_failure(exc) -> None:
+	# after_request is skipped for unhandled exceptions; count those as 500s here
+	started = g.pop("_metrics_started", None)
+	if started is not None and exc is not None:
+		endpoint = _endpoint()
+		REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - started)
+		REQUESTS.labels(endpoint, request.method, "500").inc()
+
+
+def _instrument_pool(engine) -> None:
+	pool = engine.pool
+
+	def on_checkout(*args) -> None:
+		POOL_CHECKED_OUT.inc()
+		if hasattr(pool, "overflow"):
+			POOL_OVERFLOW.set(pool.overflow())
+
+	def on_checkin(*args) -> None:
+		# The pool updates its own counters only after this event fires
+		POOL_CHECKED_OUT.dec()
+
+	event.listen(pool, "checkout", on_checkout)
+	event.listen(pool, "checkin", on_checkin)
+
+	connect = pool.connect
+
+	def timed_connect():
+		started = time.perf_counter()
+		try:
+			return connect()
+		finally:
+			POOL_WAIT.observe(time.perf_counter() - started)
+
+	pool.connect = timed_connect
+
+
+# Publishing is synchronous, so the start time only has to survive until
+# after_task_publish fires on the same thread (greenlet, under gevent)
+_publish = threading.local()
+
+
+def _before_publish(sender=None, **kwargs) -> None:
+	_publish.started = time.perf_counter()
+
+
+def _after_publish(sender=None, **kwargs) -> None:
+	started = getattr(_publish, "started", None)
+	_publish.started = None
+	if started is not None:
+		CELERY_ENQUEUE.labels(sender or "unknown").observe(time.perf_counter() - started)
+
+
+def _instrument_celery() -> None:
+	try:
+		from celery.signals import after_task_publish, before_task_publish
+	except ImportError:
+		return
+	before_task_publish.connect(_before_publish, weak=False, dispatch_uid="wallet_metrics_before_publish")
+	after_task_publish.connect(_after_publish, weak=False, dispatch_uid="wallet_metrics_after_publish")
+
+
+def metrics_view():
+	token = current_app.config.get("METRICS_TOKEN")
+	if token:
+		if request.headers.get("Authorization") != f"Bearer {token}":
+			return Response("Unauthorized\n", status=401, mimetype="text/plain")
+	elif request.remote_addr not in ("127.0.0.1", "::1") or "X-Forwarded-For" in request.headers:
+		# Without a token only a scraper on this host, not proxied traffic, may read it
+		return Response("Set METRICS_TOKEN to scrape /metrics remotely\n", status=403, mimetype="text/plain")
+	if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+		from prometheus_client import CollectorRegistry, multiprocess
+		registry = CollectorRegistry()
+		multiprocess.MultiProcessCollector(registry)
+	else:
+		registry = prometheus_client.REGISTRY
+	return Response(prometheus_client.generate_latest(registry), mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app: Flask) -> None:
+	if prometheus_client is None or not app.config.get("METRICS_ENABLED", True):
+		return
+	app.before_request(_start_timer)
+	app.after_request(_record_response)
+	app.teardown_request(_record_failure)
+	with app.app_context():
+		_instrument_pool(db.engine)
+	_instrument_celery()
+	app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -7,7 +7,7 @@ import string
 from datetime import datetime
 
 from flask_login import UserMixin
-from sqlalchemy import func
+from sqlalchemy import func, select
 
 from . import db
 from config import Config
@@ -26,9 +26,15 @@ class User(db.Model, UserMixin):
 	password_hash = db.Column(db.String(255), nullable=False)
 	role = db.Column(db.Enum(Role), default=Role.USER, nullable=False)
 	created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+	# Bumped on every UPDATE (ORM or Core) so pollers can sync incrementally
+	updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 	qr_filename = db.Column(db.String(255), nullable=True)
 	balance = db.Column(db.Integer, default=0, nullable=False)
 
+	__table_args__ = (
+		db.Index("ix_user_updated_at_id", "updated_at", "id"),
+	)
+
 	transactions = db.relationship(
 		"WalletTransaction",
 		foreign_keys="WalletTransaction.user_id",
@@ -40,6 +46,11 @@ class User(db.Model, UserMixin):
 		return str(self.id)
 
 
+# Case-insensitive lookups (usernames.find_user); not unique because legacy
+# accounts may differ only in case
+db.Index("ix_user_username_lower", func.lower(User.username))
+
+
 class WalletTransaction(db.Model):
 	id = db.Column(db.Integer, primary_key=True)
 	user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
@@ -50,6 +61,42 @@ class WalletTransaction(db.Model):
 	created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
 	reason = db.Column(db.String(255), nullable=True)
 
+	__table_args__ = (
+		# Serves per-user history pages in (created_at, id) order
+		db.Index("ix_wallet_transaction_user_created_id", "user_id", "created_at", "id"),
+	)
+
+
+class WalletActivityHourly(db.Model):
+	"""Wallet activity per hour and per performer (manager/admin), kept up to
+	date by rollups.record_activity in the same transaction as each change.
+	"""
+	hour = db.Column(db.DateTime, primary_key=True)
+	# No foreign key: rollups keep counting for performers deleted later
+	performed_by_id = db.Column(db.Integer, primary_key=True)
+	transactions = db.Column(db.Integer, default=0, nullable=False)
+	credited = db.Column(db.Integer, default=0, nullable=False)
+	debited = db.Column(db.Integer, default=0, nullable=False)
+
+
+class IdempotencyKey(db.Model):
+	"""Stored result of a balance request sent with an Idempotency-Key,
+	replayed to the same user's retries until expires_at (see idempotency.py).
+	"""
+	__table_args__ = (
+		db.UniqueConstraint("user_id", "key", name="uq_idempotency_key_user_key"),
+	)
+	id = db.Column(db.Integer, primary_key=True)
+	# No foreign key: rows simply expire, even for users deleted meanwhile
+	user_id = db.Column(db.Integer, nullable=False)
+	key = db.Column(db.String(128), nullable=False)
+	endpoint = db.Column(db.String(120), nullable=False)
+	request_hash = db.Column(db.String(64), nullable=False)
+	status_code = db.Column(db.Integer, nullable=False)
+	response = db.Column(db.Text, nullable=False)
+	created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+	expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
 
 class AuditLog(db.Model):
 	id = db.Column(db.Integer, primary_key=True)
@@ -68,18 +115,22 @@ def generate_password_from_name(name: str) -> str:
 
 
 def seed_admin() -> None:
-	from werkzeug.security import generate_password_hash
+	from .passwords import hash_password
 
 	admin_username = Config.ADMIN_USERNAME
 	admin_email = Config.ADMIN_EMAIL
 	admin_password = Config.ADMIN_PASSWORD
 
-	admin = User.query.filter(func.lower(User.username) == admin_username.lower()).first()
+	# Select just the id so startup (and `flask db upgrade`) works before
+	# migrations have added newer columns
+	admin = db.session.execute(
+		select(User.id).where(func.lower(User.username) == admin_username.lower())
+	).first()
 	if not admin:
 		admin = User(
 			username=admin_username,
 			email=admin_email,
-			password_hash=generate_password_hash(admin_password),
+			password_hash=hash_password(admin_password),
 			role=Role.ADMIN,
 			balance=0,
 		)
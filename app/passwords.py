@@ -0,0 +1,139 @@
+"""
+Password hashing that does not stall the worker.
+
+Hashes use PASSWORD_HASH_METHOD (any werkzeug method, e.g. "scrypt:32768:8:1"
+or "pbkdf2:sha256:600000") with PASSWORD_SALT_LENGTH. Hashing and checking
+run on a per-worker pool of PASSWORD_HASH_THREADS native threads: hashlib
+releases the GIL while it works, so a gevent worker's hub keeps serving other
+greenlets during a login, and the pool size caps how many hashes (32 MiB
+each for the default scrypt) run at once when everyone logs in together.
+
+A stored hash made with other parameters is replaced on the next successful
+login, so changing the method or cost needs no migration.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from flask import Flask, current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+from . import db
+
+
+def _gevent_patched() -> bool:
+	if "gevent.monkey" not in sys.modules:
+		return False
+	return sys.modules["gevent.monkey"].is_module_patched("threading")
+
+
+class HashPool:
+	"""Bounded pool of native threads, created lazily in each (forked) worker.
+	Under gevent, `threading` is patched into greenlets, so gevent's own
+	thread pool is used to get real threads.
+	"""
+
+	def __init__(self, size: int = 4) -> None:
+		self.size = size
+		self._pool = None
+		self._gevent = False
+		self._pid: int | None = None
+		self._lock = threading.Lock()
+
+	def init_app(self, app: Flask) -> None:
+		self.size = app.config.get("PASSWORD_HASH_THREADS", 4)
+
+	def _start(self) -> None:
+		with self._lock:
+			if self._pid == os.getpid():
+				return
+			self._gevent = _gevent_patched()
+			if self._gevent:
+				from gevent.threadpool import ThreadPool
+				self._pool = ThreadPool(self.size)
+			else:
+				self._pool = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="password-hash")
+			self._pid = os.getpid()
+
+	def run(self, fn, *args):
+		"""Call fn(*args) on the pool and wait for it; inline when the pool size is 0."""
+		if self.size <= 0:
+			return fn(*args)
+		if self._pid != os.getpid():
+			self._start()
+		if self._gevent:
+			return self._pool.apply(fn, args)
+		return self._pool.submit(fn, *args).result()
+
+
+hash_pool = HashPool()
+
+
+def _normalized_method(method: str) -> str:
+	"""Spell out werkzeug's defaults so "scrypt" and "scrypt:32768:8:1" compare equal."""
+	name, *args = method.split(":")
+	if name == "scrypt" and not args:
+		return "scrypt:32768:8:1"
+	if name == "pbkdf2":
+		if not args:
+			args = ["sha256"]
+		if len(args) == 1:
+			args.append(str(DEFAULT_PBKDF2_ITERATIONS))
+		return ":".join([name, *args])
+	return method
+
+
+def _hash_params() -> tuple[str, int]:
+	config = current_app.config
+	return _normalized_method(config.get("PASSWORD_HASH_METHOD", "scrypt")), config.get("PASSWORD_SALT_LENGTH", 16)
+
+
+def needs_rehash(pwhash: str, method: str | None = None, salt_length: int | None = None) -> bool:
+	"""True when `pwhash` was not made with the configured method, cost and salt length."""
+	if method is None or salt_length is None:
+		method, salt_length = _hash_params()
+	params, _, rest = pwhash.partition("$")
+	salt = rest.partition("$")[0]
+	return _normalized_method(params) != method or len(salt) != salt_length
+
+
+def password_hasher():
+	"""A picklable hash function with the configured parameters, for process pools."""
+	method, salt_length = _hash_params()
+	return partial(generate_password_hash, method=method, salt_length=salt_length)
+
+
+def hash_password(password: str) -> str:
+	return hash_pool.run(password_hasher(), password)
+
+
+def _check_and_rehash(pwhash: str, password: str, method: str, salt_length: int) -> tuple[bool, str | None]:
+	if not check_password_hash(pwhash, password):
+		return False, None
+	if needs_rehash(pwhash, method, salt_length):
+		return True, generate_password_hash(password, method=method, salt_length=salt_length)
+	return True, None
+
+
+def check_password(user, password: str) -> bool:
+	"""Verify `password` for `user` on the hash pool.
+	On success a hash with outdated parameters is replaced and committed.
+	"""
+	method, salt_length = _hash_params()
+	ok, new_hash = hash_pool.run(_check_and_rehash, user.password_hash, password, method, salt_length)
+	if new_hash is not None:
+		user.password_hash = new_hash
+		db.session.commit()
+	return ok
+
+
+def init_passwords(app: Flask) -> None:
+	method = app.config.get("PASSWORD_HASH_METHOD", "scrypt")
+	if method.split(":")[0] not in ("scrypt", "pbkdf2"):
+		raise ValueError(f"PASSWORD_HASH_METHOD must be a scrypt or pbkdf2 method, got {method!r}")
+	hash_pool.init_app(app)
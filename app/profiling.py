@@ -0,0 +1,260 @@
+"""
+On-demand statistical profiling of individual requests.
+
+A request is profiled when an admin sends `X-Profile: 1`, or at random with
+probability PROFILE_SAMPLE_RATE. While it runs, an interval timer signal
+(wall clock by default, so time spent waiting on the database counts)
+records the request's current stack every PROFILE_INTERVAL_MS. Under gevent
+the stack is read from the request's greenlet even while it is parked in
+the hub; with threads, from that thread's frame.
+
+Each profiled request appends its collapsed stacks ("a;b;c count" lines) to
+PROFILE_DIR/<endpoint>.folded, shared by all workers. /admin/profiles lists
+them and /admin/profiles/<endpoint>.svg renders an aggregated flamegraph.
+
+When nothing is being profiled the cost is one header lookup per request;
+one request per process is profiled at a time since the timer is per process.
+"""
+
+from __future__ import annotations
+
+import html
+import os
+import random
+import re
+import signal
+import sys
+import threading
+from collections import Counter
+
+from flask import Flask, current_app, g, request
+
+try:
+	import greenlet
+except ImportError:
+	greenlet = None
+
+MAX_STACK_DEPTH = 128
+CLOCKS = {
+	"wall": ("ITIMER_REAL", "SIGALRM"),
+	"cpu": ("ITIMER_PROF", "SIGPROF"),
+}
+
+
+class _Session:
+	"""The one request currently being sampled in this process."""
+
+	def __init__(self, endpoint: str) -> None:
+		self.endpoint = endpoint
+		self.samples: Counter[str] = Counter()
+		self.thread_ident: int | None = None
+		self.greenlet = None
+
+
+_lock = threading.Lock()
+_active: _Session | None = None
+_timer: int | None = None
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _frame_name(frame) -> str:
+	code = frame.f_code
+	filename = code.co_filename
+	if filename.startswith(_root):
+		filename = os.path.relpath(filename, _root)
+	else:
+		filename = os.path.basename(filename)
+	# ';' separates frames in the collapsed format
+	return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _collapse(frame) -> str:
+	names = []
+	while frame is not None and len(names) < MAX_STACK_DEPTH:
+		names.append(_frame_name(frame))
+		frame = frame.f_back
+	return ";".join(reversed(names))
+
+
+def _on_timer(signum, frame) -> None:
+	session = _active
+	if session is None:
+		return
+	if session.greenlet is not None:
+		if greenlet.getcurrent() is not session.greenlet:
+			# Parked (e.g. waiting on a socket) while the hub or another greenlet runs
+			frame = session.greenlet.gr_frame
+	elif session.thread_ident != threading.main_thread().ident:
+		frame = sys._current_frames().get(session.thread_ident)
+	if frame is not None:
+		session.samples[_collapse(frame)] += 1
+
+
+def _gevent_patched() -> bool:
+	if "gevent.monkey" not in sys.modules:
+		return False
+	return sys.modules["gevent.monkey"].is_module_patched("threading")
+
+
+def _wants_profile() -> bool:
+	if request.headers.get("X-Profile") == "1":
+		from flask_login import current_user
+		from .models import Role
+		return current_user.is_authenticated and current_user.role == Role.ADMIN
+	rate = current_app.config.get("PROFILE_SAMPLE_RATE", 0.0)
+	return rate > 0 and random.random() < rate
+
+
+def _start_profile() -> None:
+	global _active
+	if _timer is None or _active is not None or not _wants_profile():
+		return
+	if not _lock.acquire(blocking=False):
+		return
+	session = _Session(request.url_rule.endpoint if request.url_rule is not None else "unmatched")
+	if greenlet is not None and _gevent_patched():
+		session.greenlet = greenlet.getcurrent()
+	else:
+		session.thread_ident = threading.get_ident()
+	_active = session
+	g._profile_session = session
+	interval = current_app.config.get("PROFILE_INTERVAL_MS", 5) / 1000.0
+	signal.setitimer(_timer, interval, interval)
+
+
+def _stop_profile(exc=None) -> None:
+	global _active
+	session = g.pop("_profile_session", None)
+	if session is None:
+		return
+	signal.setitimer(_timer, 0, 0)
+	_active = None
+	_lock.release()
+	if session.samples:
+		_append_samples(session.endpoint, session.samples)
+
+
+def _add_profile_header(response):
+	session = g.get("_profile_session")
+	if session is not None:
+		response.headers["X-Profile-Samples"] = str(sum(session.samples.values()))
+	return response
+
+
+def profile_dir() -> str:
+	return current_app.config.get("PROFILE_DIR") or os.path.join(current_app.instance_path, "profiles")
+
+
+def _profile_path(endpoint: str) -> str:
+	return os.path.join(profile_dir(), re.sub(r"[^A-Za-z0-9_.-]", "_", endpoint) + ".folded")
+
+
+def _append_samples(endpoint: str, samples: Counter) -> None:
+	os.makedirs(profile_dir(), exist_ok=True)
+	with open(_profile_path(endpoint), "a", encoding="utf-8") as fh:
+		fh.write("".join(f"{stack} {count}\n" for stack, count in samples.items()))
+
+
+def load_profile(endpoint: str) -> Counter:
+	"""Aggregated collapsed stacks recorded for `endpoint` by every worker."""
+	totals: Counter[str] = Counter()
+	try:
+		with open(_profile_path(endpoint), encoding="utf-8") as fh:
+			for line in fh:
+				stack, _, count = line.rstrip("\n").rpartition(" ")
+				if stack and count.isdigit():
+					totals[stack] += int(count)
+	except FileNotFoundError:
+		pass
+	return totals
+
+
+def list_profiles() -> dict[str, int]:
+	"""{endpoint: total samples} for every route with recorded profiles."""
+	try:
+		names = sorted(os.listdir(profile_dir()))
+	except FileNotFoundError:
+		return {}
+	return {
+		name[:-len(".folded")]: sum(load_profile(name[:-len(".folded")]).values())
+		for name in names
+		if name.endswith(".folded")
+	}
+
+
+def clear_profile(endpoint: str) -> None:
+	try:
+		os.remove(_profile_path(endpoint))
+	except FileNotFoundError:
+		pass
+
+
+def render_flamegraph(stacks: Counter, title: str, width: int = 1200) -> str:
+	"""Minimal SVG flamegraph (root at the bottom) from collapsed stacks."""
+	tree: dict = {"count": 0, "children": {}}
+	for stack, count in stacks.items():
+		node = tree
+		node["count"] += count
+		for name in stack.split(";"):
+			node = node["children"].setdefault(name, {"count": 0, "children": {}})
+			node["count"] += count
+
+	def depth(node) -> int:
+		return 1 + max((depth(child) for child in node["children"].values()), default=0)
+
+	frame_height = 16
+	levels = depth(tree)
+	height = (levels + 2) * frame_height
+	total = tree["count"] or 1
+	scale = (width - 20) / total
+	rects = []
+
+	def draw(name: str, node, x: float, level: int) -> None:
+		w = node["count"] * scale
+		if w < 0.5:
+			return
+		y = height - (level + 1) * frame_height
+		hue = 10 + (sum(map(ord, name)) % 40)
+		pct = 100.0 * node["count"] / total
+		# Roughly 7px per monospace character; truncate labels that do not fit
+		fits = int(w / 7)
+		if len(name) <= fits:
+			label = name
+		elif fits > 3:
+			label = name[: fits - 2] + ".."
+		else:
+			label = ""
+		rects.append(
+			f'<g><title>{html.escape(name)} ({node["count"]} samples, {pct:.1f}%)</title>'
+			f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{frame_height - 1}" fill="hsl({hue},90%,60%)" rx="2"/>'
+			f'<text x="{x + 3:.1f}" y="{y + frame_height - 4}" font-size="11" font-family="monospace">{html.escape(label)}</text></g>'
+		)
+		child_x = x
+		for child_name, child in sorted(node["children"].items()):
+			draw(child_name, child, child_x, level + 1)
+			child_x += child["count"] * scale
+
+	draw("all", tree, 10, 0)
+	return (
+		f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+		f'<text x="10" y="14" font-size="13" font-family="sans-serif">{html.escape(title)} ({tree["count"]} samples)</text>'
+		+ "".join(rects)
+		+ "</svg>"
+	)
+
+
+def init_profiling(app: Flask) -> None:
+	global _timer
+	if not app.config.get("PROFILING_ENABLED", True) or not hasattr(signal, "setitimer"):
+		return
+	timer_name, signal_name = CLOCKS.get(app.config.get("PROFILE_CLOCK", "wall"), CLOCKS["wall"])
+	try:
+		signal.signal(getattr(signal, signal_name), _on_timer)
+	except ValueError:
+		# Signal handlers can only be installed from the main thread
+		app.logger.warning("Request profiling unavailable: app created outside the main thread")
+		return
+	_timer = getattr(signal, timer_name)
+	app.before_request(_start_profile)
+	app.after_request(_add_profile_header)
+	app.teardown_request(_stop_profile)
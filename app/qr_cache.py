@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from flask import Flask
+
+# Bump when the rendering changes so browsers drop their immutable copies
+QR_RENDER_VERSION = "v1"
+
+
+class QRImageCache:
+	"""Bounded LRU of rendered QR PNGs keyed by a digest of their payload.
+	An optional directory acts as a content-addressed second tier that all
+	workers on a host share, so each QR is rendered once per host rather
+	than once per worker.
+	"""
+
+	def __init__(self, max_entries: int = 1024, directory: str | None = None) -> None:
+		self.max_entries = max_entries
+		self.directory = directory
+		self._entries: OrderedDict[str, bytes] = OrderedDict()
+		self._lock = threading.Lock()
+
+	def init_app(self, app: Flask) -> None:
+		self.max_entries = int(app.config.get("QR_CACHE_SIZE", self.max_entries))
+		self.directory = app.config.get("QR_CACHE_DIR") or None
+		if self.directory:
+			os.makedirs(self.directory, exist_ok=True)
+		app.extensions["qr_cache"] = self
+
+	@staticmethod
+	def etag_for(payload: str) -> str:
+		"""Strong validator derived from the payload; no rendering needed."""
+		return hashlib.sha256(f"{QR_RENDER_VERSION}:{payload}".encode("utf-8")).hexdigest()
+
+	def get(self, payload: str) -> bytes:
+		digest = self.etag_for(payload)
+		with self._lock:
+			png = self._entries.get(digest)
+			if png is not None:
+				self._entries.move_to_end(digest)
+				return png
+		png = self._read_disk(digest)
+		if png is None:
+			from .wallet import render_qr_png
+			png = render_qr_png(payload)
+			self._write_disk(digest, png)
+		with self._lock:
+			self._entries[digest] = png
+			self._entries.move_to_end(digest)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+		return png
+
+	def _path(self, digest: str) -> str:
+		return os.path.join(self.directory, digest[:2], f"{digest}.png")
+
+	def _read_disk(self, digest: str) -> bytes | None:
+		if not self.directory:
+			return None
+		try:
+			with open(self._path(digest), "rb") as fh:
+				return fh.read()
+		except OSError:
+			return None
+
+	def _write_disk(self, digest: str, png: bytes) -> None:
+		if not self.directory:
+			return
+		path = self._path(digest)
+		try:
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+			# Write-then-rename so a concurrent reader never sees a partial file
+			fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+			with os.fdopen(fd, "wb") as fh:
+				fh.write(png)
+			os.replace(tmp_path, path)
+		except OSError:
+			pass  # The disk tier is best effort; memory still serves the image
+
+
+qr_cache = QRImageCache()
@@ -0,0 +1,376 @@
+"""
+Real-time balance updates (optional feature).
+
+Every worker keeps one broker subscription and fans incoming events out to
+the SSE connections it holds locally, so an update published by any
+worker reaches a dashboard connected to any other worker or instance.
+
+Config.REALTIME_BROKER picks the backend:
+  "memory"   - in-process only; fine for a single worker and for tests
+  "redis"    - Redis PUBLISH/SUBSCRIBE (REALTIME_BROKER_URL or REDIS_URL)
+  "postgres" - PostgreSQL LISTEN/NOTIFY on the application database
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import select
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+
+from flask import Flask
+
+from .metrics import record_sse_connections
+
+logger = logging.getLogger(__name__)
+
+
+class Broker(ABC):
+	"""Carries balance events between workers."""
+
+	@abstractmethod
+	def publish(self, message: dict) -> None:
+		...
+
+	@abstractmethod
+	def subscribe(self, handler) -> None:
+		"""Start this worker's single subscription, calling `handler(message)` per event."""
+
+	def close(self) -> None:
+		pass
+
+
+class InProcessBroker(Broker):
+	"""Delivers straight to this process's subscribers; also the local stand-in for tests."""
+
+	def __init__(self) -> None:
+		self._handlers: list = []
+
+	def publish(self, message: dict) -> None:
+		for handler in list(self._handlers):
+			handler(message)
+
+	def subscribe(self, handler) -> None:
+		self._handlers.append(handler)
+
+	def close(self) -> None:
+		self._handlers.clear()
+
+
+class _ListenerThreadBroker(Broker):
+	"""Runs a reconnecting listen loop on a daemon thread."""
+
+	reconnect_delay = 1.0
+	max_reconnect_delay = 60.0
+
+	def __init__(self) -> None:
+		self._stopping = threading.Event()
+		self._thread: threading.Thread | None = None
+
+	def subscribe(self, handler) -> None:
+		self._thread = threading.Thread(target=self._run, args=(handler,), name="realtime-listener", daemon=True)
+		self._thread.start()
+
+	def _run(self, handler) -> None:
+		delay = self.reconnect_delay
+		while not self._stopping.is_set():
+			started = time.monotonic()
+			try:
+				self._listen(handler)
+			except Exception:
+				# Broker restarts or network blips: back off and resubscribe. A
+				# listener that stayed up a while starts over at the short delay;
+				# one that keeps failing (bad URL, auth) is logged less and less often
+				if time.monotonic() - started > self.max_reconnect_delay:
+					delay = self.reconnect_delay
+				logger.exception("%s listener failed; resubscribing in %.1fs", type(self).__name__, delay)
+				self._stopping.wait(delay)
+				delay = min(delay * 2, self.max_reconnect_delay)
+
+	@abstractmethod
+	def _listen(self, handler) -> None:
+		...
+
+	def close(self) -> None:
+		self._stopping.set()
+
+
+class RedisBroker(_ListenerThreadBroker):
+	"""Redis (or any RESP-compatible server) PUBLISH/SUBSCRIBE.
+	Pass `client` to use an existing or stand-in client instead of `url`.
+	"""
+
+	def __init__(self, url: str | None = None, channel: str = "wallet:balance", client=None) -> None:
+		super().__init__()
+		if client is None:
+			import redis
+			client = redis.Redis.from_url(url)
+		self.client = client
+		self.channel = channel
+
+	def publish(self, message: dict) -> None:
+		self.client.publish(self.channel, json.dumps(message))
+
+	def _listen(self, handler) -> None:
+		pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+		pubsub.subscribe(self.channel)
+		try:
+			while not self._stopping.is_set():
+				msg = pubsub.get_message(timeout=1.0)
+				if msg and msg.get("type") == "message":
+					handler(json.loads(msg["data"]))
+		finally:
+			pubsub.close()
+
+
+class PostgresBroker(_ListenerThreadBroker):
+	"""PostgreSQL LISTEN/NOTIFY. Publishing borrows a pooled connection;
+	listening holds one dedicated autocommit connection per worker.
+	"""
+
+	def __init__(self, engine, dsn: str, channel: str = "wallet_balance") -> None:
+		super().__init__()
+		self.engine = engine
+		self.dsn = dsn
+		self.channel = channel
+
+	def publish(self, message: dict) -> None:
+		from sqlalchemy import text
+		with self.engine.connect() as conn:
+			conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.channel, "payload": json.dumps(message)})
+			conn.commit()
+
+	def _listen(self, handler) -> None:
+		import psycopg2
+		conn = psycopg2.connect(self.dsn)
+		try:
+			conn.autocommit = True
+			with conn.cursor() as cursor:
+				cursor.execute(f'LISTEN "{self.channel}"')
+			while not self._stopping.is_set():
+				if select.select([conn], [], [], 1.0) == ([], [], []):
+					continue
+				conn.poll()
+				while conn.notifies:
+					handler(json.loads(conn.notifies.pop(0).payload))
+		finally:
+			conn.close()
+
+
+def create_broker(app: Flask) -> Broker:
+	kind = app.config.get("REALTIME_BROKER", "memory")
+	url = app.config.get("REALTIME_BROKER_URL")
+	if kind == "memory":
+		return InProcessBroker()
+	if kind == "redis":
+		return RedisBroker(url or os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+	if kind == "postgres":
+		from sqlalchemy.engine import make_url
+		from . import db
+		with app.app_context():
+			engine = db.engine
+		# libpq only accepts postgresql://, not SQLAlchemy's postgresql+psycopg2://
+		dsn = make_url(url) if url else engine.url
+		return PostgresBroker(engine, dsn.set(drivername="postgresql").render_as_string(hide_password=False))
+	raise ValueError(f"Unknown REALTIME_BROKER {kind!r}")
+
+
+class Subscription:
+	"""One SSE connection's bounded buffer.
+	A queued balance update is replaced by a newer one instead of queueing
+	behind it, so a slow or background tab only ever sees the latest balance.
+	"""
+
+	def __init__(self, user_id: int, maxlen: int) -> None:
+		self.user_id = user_id
+		self.maxlen = max(1, maxlen)
+		self.last_active = time.monotonic()
+		self.closed = False
+		self._items: deque[dict] = deque()
+		self._cond = threading.Condition()
+
+	def put(self, data: dict) -> str:
+		"""Queue `data`; returns "queued", "coalesced" or "dropped_oldest"."""
+		with self._cond:
+			outcome = "queued"
+			if data.get("type") == "balance_update":
+				for idx, queued in enumerate(self._items):
+					if queued.get("type") == "balance_update":
+						merged = dict(data)
+						merged["change_amount"] = queued.get("change_amount", 0) + data.get("change_amount", 0)
+						self._items[idx] = merged
+						self._cond.notify()
+						return "coalesced"
+			if len(self._items) >= self.maxlen:
+				self._items.popleft()
+				outcome = "dropped_oldest"
+			self._items.append(data)
+			self._cond.notify()
+			return outcome
+
+	def get(self, timeout: float) -> dict | None:
+		"""Next message, or None after `timeout` seconds (or once closed)."""
+		with self._cond:
+			self.last_active = time.monotonic()
+			if not self._items and not self.closed:
+				self._cond.wait(timeout)
+			self.last_active = time.monotonic()
+			return self._items.popleft() if self._items else None
+
+	def depth(self) -> int:
+		return len(self._items)
+
+	def close(self) -> None:
+		with self._cond:
+			self.closed = True
+			self._cond.notify_all()
+
+
+class SubscriptionRegistry:
+	"""Per-worker map of user id -> open SSE subscriptions, with counters."""
+
+	def __init__(self, buffer_size: int = 16, idle_timeout: float = 90.0) -> None:
+		self.buffer_size = buffer_size
+		self.idle_timeout = idle_timeout
+		self._subs: dict[int, set[Subscription]] = {}
+		self._lock = threading.Lock()
+		self._last_sweep = time.monotonic()
+		self.counters = {
+			"connections_opened": 0,
+			"connections_closed": 0,
+			"evicted_idle": 0,
+			"delivered": 0,
+			"coalesced": 0,
+			"dropped": 0,
+			"undeliverable": 0,
+		}
+
+	def subscribe(self, user_id: int) -> Subscription:
+		sub = Subscription(user_id, self.buffer_size)
+		with self._lock:
+			self._subs.setdefault(user_id, set()).add(sub)
+			self.counters["connections_opened"] += 1
+		record_sse_connections(1)
+		self.evict_idle()
+		return sub
+
+	def unsubscribe(self, sub: Subscription) -> None:
+		sub.close()
+		with self._lock:
+			subs = self._subs.get(sub.user_id)
+			if subs is not None and sub in subs:
+				subs.discard(sub)
+				self.counters["connections_closed"] += 1
+				record_sse_connections(-1)
+				if not subs:
+					del self._subs[sub.user_id]
+
+	def publish(self, user_id: int, data: dict) -> int:
+		"""Hand `data` to every local subscription for `user_id`; returns how many."""
+		with self._lock:
+			subs = list(self._subs.get(user_id, ()))
+		if not subs:
+			self.counters["undeliverable"] += 1
+		for sub in subs:
+			outcome = sub.put(data)
+			self.counters["delivered"] += 1
+			if outcome == "coalesced":
+				self.counters["coalesced"] += 1
+			elif outcome == "dropped_oldest":
+				self.counters["dropped"] += 1
+		self.evict_idle()
+		return len(subs)
+
+	def evict_idle(self) -> int:
+		"""Close subscriptions whose reader has not polled within idle_timeout."""
+		now = time.monotonic()
+		if now - self._last_sweep < min(self.idle_timeout, 10.0):
+			return 0
+		self._last_sweep = now
+		with self._lock:
+			stale = [sub for subs in self._subs.values() for sub in subs if now - sub.last_active > self.idle_timeout]
+		for sub in stale:
+			self.unsubscribe(sub)
+			self.counters["evicted_idle"] += 1
+		return len(stale)
+
+	def stats(self) -> dict:
+		with self._lock:
+			subs = [sub for group in self._subs.values() for sub in group]
+			users = len(self._subs)
+		depths = [sub.depth() for sub in subs]
+		return {
+			"pid": os.getpid(),
+			"connections": len(subs),
+			"users": users,
+			"queued": sum(depths),
+			"max_queue_depth": max(depths, default=0),
+			"buffer_size": self.buffer_size,
+			**self.counters,
+		}
+
+
+class RealtimeHub:
+	"""Owns the broker and this worker's local SSE subscriptions."""
+
+	def __init__(self) -> None:
+		self.broker: Broker = InProcessBroker()
+		self.registry = SubscriptionRegistry()
+		self._lock = threading.Lock()
+		self._subscribed_pid: int | None = None
+
+	def init_app(self, app: Flask) -> None:
+		self.broker = create_broker(app)
+		self.registry = SubscriptionRegistry(
+			buffer_size=app.config.get("REALTIME_BUFFER_SIZE", 16),
+			idle_timeout=app.config.get("REALTIME_IDLE_TIMEOUT", 90),
+		)
+		self._subscribed_pid = None
+		app.extensions["realtime"] = self
+
+	def ensure_subscribed(self) -> None:
+		"""Subscribe once per worker process; called lazily so a preloading
+		gunicorn master never owns a subscription its children would inherit."""
+		if self._subscribed_pid == os.getpid():
+			return
+		with self._lock:
+			if self._subscribed_pid == os.getpid():
+				return
+			self.broker.subscribe(self.deliver)
+			self._subscribed_pid = os.getpid()
+
+	def publish(self, user_id: int, update_data: dict) -> None:
+		self.broker.publish({"user_id": user_id, "data": update_data})
+
+	def deliver(self, message: dict) -> None:
+		"""Fan one broker event out to this worker's connections for that user."""
+		self.registry.publish(message.get("user_id"), message["data"])
+
+	def subscribe(self, user_id: int) -> Subscription:
+		self.ensure_subscribed()
+		return self.registry.subscribe(user_id)
+
+	def unsubscribe(self, sub: Subscription) -> None:
+		self.registry.unsubscribe(sub)
+
+
+hub = RealtimeHub()
+
+
+def send_balance_update(user_id, new_balance, change_amount, reason):
+	"""Send balance update to a specific user (safe to call even if feature disabled)"""
+	try:
+		hub.publish(user_id, {
+			'type': 'balance_update',
+			'new_balance': new_balance,
+			'change_amount': change_amount,
+			'reason': reason,
+			'timestamp': time.time()
+		})
+	except Exception:
+		# Silently fail to not disrupt existing functionality
+		pass
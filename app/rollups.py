@@ -0,0 +1,173 @@
+"""
+Hourly wallet activity rollups (WalletActivityHourly).
+
+change_balance() adds to the row for (hour, performer) in the same
+transaction as the ledger entry, so the monitor and stats endpoints read a
+few dozen pre-aggregated rows instead of scanning wallet_transaction. The
+additions are summed per transaction and upserted just before it commits:
+the shared rollup row is then the last lock a transaction takes and is held
+briefly, and a batch of changes costs one upsert per row. Daily
+figures are summed from the hourly rows. `flask rollups rebuild` recomputes
+them from the ledger, e.g. after the first deploy or a manual data fix.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import click
+from flask import Flask
+from sqlalchemy import delete, event, func, insert, select, update
+
+from . import db
+from .models import User, WalletActivityHourly, WalletTransaction
+
+
+def truncate_hour(at: datetime) -> datetime:
+	return at.replace(minute=0, second=0, microsecond=0)
+
+
+def _activity_values(delta: int) -> dict:
+	return {"transactions": 1, "credited": max(delta, 0), "debited": max(-delta, 0)}
+
+
+def record_activity(performed_by_id: int, delta: int, at: datetime) -> None:
+	"""Add one balance change to its hourly rollup row when the session commits."""
+	pending = db.session.info.setdefault("_pending_activity", {})
+	row = pending.setdefault((truncate_hour(at), performed_by_id), {"transactions": 0, "credited": 0, "debited": 0})
+	for name, value in _activity_values(delta).items():
+		row[name] += value
+
+
+@event.listens_for(db.session, "before_commit")
+def _write_pending_activity(session) -> None:
+	pending = session.info.pop("_pending_activity", None)
+	# Key order, so concurrent transactions lock shared rows in the same order
+	for (hour, performed_by_id), counts in sorted((pending or {}).items()):
+		_upsert_activity(session, {"hour": hour, "performed_by_id": performed_by_id, **counts})
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_pending_activity(session) -> None:
+	session.info.pop("_pending_activity", None)
+
+
+def _upsert_activity(session, values: dict) -> None:
+	table = WalletActivityHourly
+	performed_by_id = values["performed_by_id"]
+	dialect = session.get_bind().dialect.name
+	if dialect in ("postgresql", "sqlite"):
+		if dialect == "postgresql":
+			from sqlalchemy.dialects.postgresql import insert as upsert
+		else:
+			from sqlalchemy.dialects.sqlite import insert as upsert
+		stmt = upsert(table).values(**values)
+		stmt = stmt.on_conflict_do_update(
+			index_elements=[table.hour, table.performed_by_id],
+			set_={
+				"transactions": table.transactions + stmt.excluded.transactions,
+				"credited": table.credited + stmt.excluded.credited,
+				"debited": table.debited + stmt.excluded.debited,
+			},
+		)
+		session.execute(stmt)
+		return
+	# Other databases: update, and insert when the row does not exist yet
+	result = session.execute(
+		update(table)
+		.where(table.hour == values["hour"], table.performed_by_id == performed_by_id)
+		.values(
+			transactions=table.transactions + values["transactions"],
+			credited=table.credited + values["credited"],
+			debited=table.debited + values["debited"],
+		)
+	)
+	if result.rowcount == 0:
+		session.execute(insert(table).values(**values))
+
+
+def rebuild_rollups(since: datetime | None = None) -> int:
+	"""Recompute hourly rows from wallet_transaction (all of it, or from `since`).
+	Returns the number of rows written; does not commit.
+	"""
+	table = WalletActivityHourly
+	stmt = select(WalletTransaction.created_at, WalletTransaction.performed_by_id, WalletTransaction.change_amount)
+	clear = delete(table)
+	if since is not None:
+		since = truncate_hour(since)
+		stmt = stmt.where(WalletTransaction.created_at >= since)
+		clear = clear.where(table.hour >= since)
+
+	totals: dict[tuple, dict] = defaultdict(lambda: {"transactions": 0, "credited": 0, "debited": 0})
+	for created_at, performed_by_id, delta in db.session.execute(stmt.execution_options(yield_per=10_000)):
+		row = totals[(truncate_hour(created_at), performed_by_id)]
+		for name, value in _activity_values(delta).items():
+			row[name] += value
+
+	db.session.execute(clear)
+	rows = [{"hour": hour, "performed_by_id": performer, **counts} for (hour, performer), counts in totals.items()]
+	if rows:
+		db.session.execute(insert(table), rows)
+	return len(rows)
+
+
+def hourly_activity(hours: int = 24) -> list[tuple]:
+	"""(hour, transactions, credited, debited) for recent hours, newest first."""
+	table = WalletActivityHourly
+	since = truncate_hour(datetime.utcnow()) - timedelta(hours=hours - 1)
+	return db.session.execute(
+		select(
+			table.hour,
+			func.sum(table.transactions),
+			func.sum(table.credited),
+			func.sum(table.debited),
+		)
+		.where(table.hour >= since)
+		.group_by(table.hour)
+		.order_by(table.hour.desc())
+	).all()
+
+
+def daily_activity(days: int = 7) -> list[tuple]:
+	"""(date, transactions, credited, debited) for recent days, newest first."""
+	table = WalletActivityHourly
+	since = truncate_hour(datetime.utcnow()).replace(hour=0) - timedelta(days=days - 1)
+	totals: dict = defaultdict(lambda: [0, 0, 0])
+	for hour, transactions, credited, debited in db.session.execute(
+		select(table.hour, table.transactions, table.credited, table.debited).where(table.hour >= since)
+	):
+		day = totals[hour.date()]
+		day[0] += transactions
+		day[1] += credited
+		day[2] += debited
+	return [(day, *counts) for day, counts in sorted(totals.items(), reverse=True)]
+
+
+def performer_activity(hours: int = 24) -> list[tuple]:
+	"""(username, transactions, credited, debited) per manager/admin, busiest first."""
+	table = WalletActivityHourly
+	since = truncate_hour(datetime.utcnow()) - timedelta(hours=hours - 1)
+	transactions = func.sum(table.transactions)
+	return db.session.execute(
+		select(User.username, transactions, func.sum(table.credited), func.sum(table.debited))
+		.select_from(table)
+		.outerjoin(User, User.id == table.performed_by_id)
+		.where(table.hour >= since)
+		.group_by(table.performed_by_id, User.username)
+		.order_by(transactions.desc())
+	).all()
+
+
+def init_rollups(app: Flask) -> None:
+	@app.cli.group("rollups")
+	def rollups_cli():
+		"""Wallet activity rollups."""
+
+	@rollups_cli.command("rebuild")
+	@click.option("--since", type=click.DateTime(), default=None, help="Only rebuild hours from this UTC time on.")
+	def rebuild_command(since):
+		"""Recompute hourly rollups from the transaction ledger."""
+		written = rebuild_rollups(since)
+		db.session.commit()
+		click.echo(f"Rebuilt {written} hourly rollup rows")
@@ -1,16 +1,24 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, current_app, make_response
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, current_app, make_response, Response, stream_with_context
 from flask_login import login_required, current_user
-from werkzeug.security import check_password_hash
-import psycopg2
-from sqlalchemy import text
+from sqlalchemy import select, text
+import base64
+import binascii
 import os
 import time
 
 from .models import User, Role, WalletTransaction
-from .wallet import ensure_qr_for_user, change_balance, generate_qr_data_uri
-from . import db, cache
+from .wallet import change_balance
+from .qr_cache import qr_cache
+from .realtime import hub as realtime_hub, send_balance_update
+from .db_monitor import format_bytes, sampler as db_sampler
+from .profiling import clear_profile, list_profiles, load_profile, render_flamegraph
+from .rollups import daily_activity, hourly_activity, performer_activity
+from .caching import cache_stats, invalidate_user
+from .passwords import hash_password
+from .idempotency import begin_idempotent, new_key
+from .usernames import find_user, find_user_id, find_users, normalize_username
+from . import db
 from .audit import log_event
-from .email_utils import send_credentials_email
 
 main_bp = Blueprint("main", __name__)
 
@@ -45,28 +53,202 @@ def debug_users():
 	return {"users": result, "count": len(result)}
 
 
+# Columns /api/users can return; "id" is always included for the cursor
+API_USER_FIELDS = {
+	"id": User.id,
+	"username": User.username,
+	"email": User.email,
+	"role": User.role,
+	"balance": User.balance,
+	"created_at": User.created_at,
+	"updated_at": User.updated_at,
+}
+
+
 @main_bp.get("/api/users")
 def api_users():
 	"""Public API to fetch user list for external systems.
 	Secured via EXTERNAL_API_KEY provided as 'X-API-Key' header or 'api_key' query param.
+
+	Query params:
+	  limit          page size (default/max API_USERS_PAGE_SIZE)
+	  after_id       keyset cursor: return users with id > after_id
+	  fields         comma-separated subset of API_USER_FIELDS
+	  updated_since  ISO timestamp (UTC unless it has an offset); only users
+	                 changed at/after it, ordered by (updated_at, id) and paged
+	                 with after_id within that order
+	Responses carry an ETag; a matching If-None-Match gets a 304.
+
+	updated_at is stamped before the change commits, so a sync leaves out
+	changes from the last API_USERS_SYNC_LAG seconds: a slower transaction
+	could still commit one that sorts before them. Delivery is at least once;
+	a user changed again later is returned again, so clients upsert by id.
 	"""
+	from datetime import datetime, timedelta, timezone
+	import hashlib
+	from sqlalchemy import func, tuple_
+	
 	api_key = request.headers.get("X-API-Key") or request.args.get("api_key")
 	expected = os.environ.get("EXTERNAL_API_KEY") or current_app.config.get("EXTERNAL_API_KEY")
 	if not expected or api_key != expected:
 		return jsonify({"error": "Unauthorized"}), 403
 
-	users = User.query.all()
+	max_limit = current_app.config.get("API_USERS_PAGE_SIZE", 1000)
+	try:
+		limit = min(max(int(request.args.get("limit", max_limit)), 1), max_limit)
+		after_id = int(request.args.get("after_id", 0))
+		since_raw = request.args.get("updated_since")
+		since = datetime.fromisoformat(since_raw.replace("Z", "+00:00")) if since_raw else None
+		if since is not None and since.tzinfo is not None:
+			since = since.astimezone(timezone.utc).replace(tzinfo=None)
+	except ValueError:
+		return jsonify({"error": "Invalid limit, after_id or updated_since"}), 400
+	fields = [f.strip() for f in request.args.get("fields", ",".join(API_USER_FIELDS)).split(",") if f.strip()]
+	unknown = [f for f in fields if f not in API_USER_FIELDS]
+	if unknown:
+		return jsonify({"error": f"Unknown fields: {', '.join(unknown)}"}), 400
+	if "id" not in fields:
+		fields.insert(0, "id")
+
+	# Cheap change detector: any insert, update or delete moves one of these
+	total, last_change = db.session.execute(
+		select(func.count(User.id), func.max(User.updated_at))
+	).one()
+	cutoff = None
+	if since is not None:
+		cutoff = datetime.utcnow() - timedelta(seconds=current_app.config.get("API_USERS_SYNC_LAG", 30))
+		# While changes are held back the page moves with the cutoff
+		if last_change is not None and last_change > cutoff:
+			last_change = cutoff
+	etag = hashlib.sha1(
+		f"{total}:{last_change}:{limit}:{after_id}:{since}:{','.join(fields)}".encode("utf-8")
+	).hexdigest()
+	if request.if_none_match.contains(etag):
+		response = make_response("", 304)
+		response.set_etag(etag)
+		return response
+
+	columns = [API_USER_FIELDS[f] for f in fields]
+	if "updated_at" not in fields:
+		columns.append(User.updated_at)
+	stmt = select(*columns)
+	if since is not None:
+		stmt = stmt.where(
+			tuple_(User.updated_at, User.id) > tuple_(since, after_id),
+			User.updated_at <= cutoff,
+		).order_by(User.updated_at, User.id)
+	else:
+		stmt = stmt.where(User.id > after_id).order_by(User.id)
+	rows = db.session.execute(stmt.limit(limit + 1)).all()
+	has_more = len(rows) > limit
+	rows = rows[:limit]
+
 	payload = []
-	for u in users:
-		payload.append({
-			"id": u.id,
-			"username": u.username,
-			"email": u.email,
-			"role": (u.role.value if u.role else None),
-			"balance": u.balance,
-			"created_at": (u.created_at.isoformat() if u.created_at else None),
-		})
-	return jsonify({"users": payload, "count": len(payload)})
+	for row in rows:
+		item = {}
+		for name in fields:
+			value = getattr(row, name)
+			if name == "role":
+				value = value.value if value else None
+			elif name in ("created_at", "updated_at"):
+				value = value.isoformat() if value else None
+			item[name] = value
+		payload.append(item)
+
+	body = {"users": payload, "count": len(payload), "has_more": has_more}
+	if rows:
+		last = rows[-1]
+		body["next"] = {"after_id": last.id}
+		if since is not None:
+			body["next"]["updated_since"] = last.updated_at.isoformat()
+	response = jsonify(body)
+	response.set_etag(etag)
+	response.cache_control.no_cache = True
+	return response
+
+
+def _encode_history_cursor(created_at, tx_id) -> str:
+	return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{tx_id}".encode("utf-8")).decode("ascii")
+
+
+def _decode_history_cursor(cursor: str):
+	from datetime import datetime
+	created_at, tx_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+	return datetime.fromisoformat(created_at), int(tx_id)
+
+
+@main_bp.get("/api/transactions")
+@login_required
+def api_transactions():
+	"""Wallet transaction history, newest first.
+	Users see their own; managers and admins may pass ?username= for anyone's.
+
+	Query params:
+	  username  whose history (default: the caller)
+	  limit     page size (default/max API_TRANSACTIONS_PAGE_SIZE)
+	  cursor    the "next_cursor" of the previous page
+	Pages are keyset-paginated over (user_id, created_at, id), so a deep
+	cursor costs the same index range scan as the first page.
+	"""
+	from sqlalchemy import tuple_
+	from sqlalchemy.orm import aliased
+
+	username = request.args.get("username", "").strip()
+	if username and normalize_username(username) != normalize_username(current_user.username):
+		if current_user.role not in (Role.ADMIN, Role.MANAGER):
+			return jsonify({"error": "Unauthorized"}), 403
+		user_id = find_user_id(username)
+		if user_id is None:
+			return jsonify({"error": "User not found"}), 404
+	else:
+		user_id = current_user.id
+
+	max_limit = current_app.config.get("API_TRANSACTIONS_PAGE_SIZE", 100)
+	try:
+		limit = min(max(int(request.args.get("limit", max_limit)), 1), max_limit)
+		cursor = request.args.get("cursor")
+		before = _decode_history_cursor(cursor) if cursor else None
+	except (ValueError, UnicodeDecodeError, binascii.Error):
+		return jsonify({"error": "Invalid limit or cursor"}), 400
+
+	performer = aliased(User)
+	stmt = (
+		select(
+			WalletTransaction.id,
+			WalletTransaction.change_amount,
+			WalletTransaction.balance_after,
+			WalletTransaction.reason,
+			WalletTransaction.created_at,
+			performer.username.label("performed_by"),
+		)
+		.outerjoin(performer, performer.id == WalletTransaction.performed_by_id)
+		.where(WalletTransaction.user_id == user_id)
+		.order_by(WalletTransaction.created_at.desc(), WalletTransaction.id.desc())
+	)
+	if before is not None:
+		stmt = stmt.where(tuple_(WalletTransaction.created_at, WalletTransaction.id) < tuple_(*before))
+	rows = db.session.execute(stmt.limit(limit + 1)).all()
+	has_more = len(rows) > limit
+	rows = rows[:limit]
+
+	body = {
+		"transactions": [
+			{
+				"id": row.id,
+				"change_amount": row.change_amount,
+				"balance_after": row.balance_after,
+				"reason": row.reason,
+				"performed_by": row.performed_by,
+				"created_at": row.created_at.isoformat(),
+			}
+			for row in rows
+		],
+		"count": len(rows),
+		"has_more": has_more,
+	}
+	if has_more:
+		body["next_cursor"] = _encode_history_cursor(rows[-1].created_at, rows[-1].id)
+	return jsonify(body)
 
 
 @main_bp.post("/admin/delete-user")
@@ -85,7 +267,7 @@ def admin_delete_user():
 		flash("Username confirmation does not match. User not deleted.", "danger")
 		return redirect(url_for("main.dashboard"))
 	
-	target = User.query.filter_by(username=username).first()
+	target = find_user(username)
 	if not target:
 		flash("User not found", "danger")
 		return redirect(url_for("main.dashboard"))
@@ -122,42 +304,58 @@ def admin_delete_user():
 	
 	# Delete the user
 	db.session.delete(target)
+	log_event("admin_user_deleted", resource=user_username)
 	db.session.commit()
 	
 	# Invalidate any cached data for this user
-	cache.delete(f"user_data_{user_id}")
+	invalidate_user(user_id)
 	
 	flash(f"User {user_username} has been deleted successfully", "success")
-	log_event("admin_user_deleted", resource=user_username)
 	return redirect(url_for("main.dashboard"))
 
 
 @main_bp.get("/dashboard")
 @login_required
 def dashboard():
-	print(f"DEBUG: Dashboard accessed by user: {current_user.username}, role: {current_user.role}")
-	print(f"DEBUG: User authenticated: {current_user.is_authenticated}")
-	
-	# Cache user data for 5 minutes to reduce database queries
-	cache_key = f"user_data_{current_user.id}"
-	user_data = cache.get(cache_key)
-	
-	if not user_data:
-		user_data = {
-			'username': current_user.username,
-			'balance': current_user.balance,
-			'role': current_user.role.value,
-			'email': current_user.email
-		}
-		cache.set(cache_key, user_data, timeout=300)
+	current_app.logger.debug("Dashboard accessed", extra={"username": current_user.username, "role": current_user.role.value})
 	
+	# A fresh key per render: resubmitting the same form replays instead of charging twice
 	if current_user.role == Role.ADMIN:
-		return render_template("admin_dashboard.html")
+		return render_template("admin_dashboard.html", idempotency_key=new_key())
 	if current_user.role == Role.MANAGER:
-		return render_template("manager_dashboard.html")
+		return render_template("manager_dashboard.html", idempotency_key=new_key())
 	# USER
-	qr_data_uri = generate_qr_data_uri(current_user)
-	return render_template("user_dashboard.html", qr_filename=None, qr_data_uri=qr_data_uri, balance=current_user.balance)
+	qr_url = url_for(
+		"main.qr_image",
+		username=current_user.username,
+		v=qr_cache.etag_for(current_user.username)[:16],
+	)
+	return render_template("user_dashboard.html", qr_filename=None, qr_url=qr_url, balance=current_user.balance)
+
+
+@main_bp.get("/qr/<username>")
+@login_required
+def qr_image(username):
+	"""QR code PNG for a user, served from the QR cache with a strong ETag.
+	The dashboard links it with a version parameter, so browsers can keep it forever.
+	"""
+	if current_user.username != username:
+		if current_user.role not in [Role.ADMIN, Role.MANAGER]:
+			return jsonify({"error": "Unauthorized"}), 403
+		if find_user_id(username) is None:
+			return jsonify({"error": "User not found"}), 404
+	
+	etag = qr_cache.etag_for(username)
+	if request.if_none_match.contains(etag):
+		response = make_response("", 304)
+	else:
+		response = make_response(qr_cache.get(username))
+		response.headers["Content-Type"] = "image/png"
+	response.set_etag(etag)
+	response.cache_control.private = True
+	response.cache_control.max_age = 31536000
+	response.cache_control.immutable = True
+	return response
 
 
 @main_bp.post("/admin/update-balance")
@@ -168,24 +366,7 @@ def admin_update_balance():
 		return redirect(url_for("main.dashboard"))
 	username = request.form.get("username", "").strip()
 	delta = int(request.form.get("delta", "0"))
-	target = User.query.filter_by(username=username).first()
-	if not target:
-		flash("User not found", "danger")
-		return redirect(url_for("main.dashboard"))
-	
-	transaction, success, message = change_balance(target, delta, reason="admin_update")
-	if success:
-		# Invalidate cache for the user whose balance was updated
-		cache.delete(f"user_data_{target.id}")
-		# Send real-time update to user (optional feature)
-		try:
-			send_balance_update(target.id, target.balance, delta, "admin_update")
-		except:
-			pass  # Silently fail to not disrupt existing functionality
-		flash(message, "success")
-	else:
-		flash(message, "warning")
-	return redirect(url_for("main.dashboard"))
+	return _update_balance_form(username, delta, "admin_update")
 
 
 @main_bp.post("/manager/update-balance")
@@ -198,18 +379,36 @@ def manager_update_balance():
 	action = request.form.get("action", "add")
 	amount = int(request.form.get("amount", "0"))
 	delta = amount if action == "add" else -amount
-	target = User.query.filter_by(username=username).first()
+	return _update_balance_form(username, delta, f"manager_{action}")
+
+
+def _update_balance_form(username: str, delta: int, reason: str):
+	"""Shared body of the balance forms; a retried Idempotency-Key replays the first result."""
+	try:
+		idem = begin_idempotent()
+	except ValueError as e:
+		flash(str(e), "danger")
+		return redirect(url_for("main.dashboard"))
+	if idem is not None and idem.replay is not None:
+		flash(idem.replay["message"], idem.replay["category"])
+		return redirect(url_for("main.dashboard"))
+
+	target = find_user(username)
 	if not target:
 		flash("User not found", "danger")
 		return redirect(url_for("main.dashboard"))
 	
-	transaction, success, message = change_balance(target, delta, reason=f"manager_{action}")
+	transaction, success, message = change_balance(target, delta, reason=reason, commit=idem is None)
+	if success and idem is not None:
+		if not idem.commit({"message": message, "category": "success"}):
+			# A concurrent retry won; our change was rolled back
+			flash(idem.replay["message"], idem.replay["category"])
+			return redirect(url_for("main.dashboard"))
+		invalidate_user(target.id)
 	if success:
-		# Invalidate cache for the user whose balance was updated
-		cache.delete(f"user_data_{target.id}")
 		# Send real-time update to user (optional feature)
 		try:
-			send_balance_update(target.id, target.balance, delta, f"manager_{action}")
+			send_balance_update(target.id, target.balance, delta, reason)
 		except:
 			pass  # Silently fail to not disrupt existing functionality
 		flash(message, "success")
@@ -218,6 +417,157 @@ def manager_update_balance():
 	return redirect(url_for("main.dashboard"))
 
 
+@main_bp.post("/api/balance/batch")
+@login_required
+def api_balance_batch():
+	"""Apply many balance changes in one request and one transaction.
+
+	Body: {"items": [{"username": "...", "delta": 5, "reason": "..."}, ...]}
+	Users are resolved with a single IN query and every item goes through
+	change_balance; items that fail (unknown user, insufficient funds) are
+	reported and the rest are committed together. Items are applied in user
+	id order; the response has one result per item, in request order. With an Idempotency-Key header a retried batch gets
+	the first response back instead of being applied again.
+	"""
+	if current_user.role not in (Role.ADMIN, Role.MANAGER):
+		return jsonify({"error": "Unauthorized"}), 403
+	try:
+		idem = begin_idempotent()
+	except ValueError as e:
+		return jsonify({"error": str(e)}), 422
+	if idem is not None and idem.replay is not None:
+		return _replayed(idem)
+	payload = request.get_json(silent=True)
+	items = payload.get("items") if isinstance(payload, dict) else None
+	max_items = current_app.config.get("BALANCE_BATCH_MAX_ITEMS", 500)
+	if not isinstance(items, list) or not items:
+		return jsonify({"error": "Expected a non-empty \"items\" list"}), 400
+	if len(items) > max_items:
+		return jsonify({"error": f"At most {max_items} items per batch"}), 400
+
+	default_reason = "manager_batch" if current_user.role == Role.MANAGER else "admin_batch"
+	parsed = []
+	for item in items:
+		try:
+			username = str(item["username"]).strip()
+			delta = int(item["delta"])
+			reason = str(item.get("reason") or default_reason)[:255]
+		except (KeyError, TypeError, ValueError, AttributeError):
+			parsed.append(None)
+			continue
+		parsed.append((username, delta, reason) if username and delta else None)
+
+	names = {p[0] for p in parsed if p is not None}
+	users = find_users(names)
+
+	results: list[dict | None] = [None] * len(parsed)
+	resolved = []
+	for index, entry in enumerate(parsed):
+		if entry is None:
+			results[index] = {"index": index, "ok": False, "error": "Each item needs a username and a non-zero integer delta"}
+			continue
+		username, delta, reason = entry
+		target = users.get(normalize_username(username))
+		if target is None:
+			results[index] = {"index": index, "username": username, "ok": False, "error": "User not found"}
+			continue
+		resolved.append((target.id, index, target, username, delta, reason))
+
+	# Lock users in id order: concurrent batches naming the same users in a
+	# different order would otherwise deadlock on Postgres
+	applied = []
+	for _, index, target, username, delta, reason in sorted(resolved, key=lambda r: (r[0], r[1])):
+		transaction, success, message = change_balance(target, delta, reason=reason, commit=False)
+		result = {"index": index, "username": username, "ok": success, "balance": target.balance}
+		if success:
+			applied.append((result, transaction, target.id, delta, reason))
+		else:
+			result["error"] = message
+		results[index] = result
+
+	body = {
+		"results": results,
+		"applied": len(applied),
+		"failed": len(results) - len(applied),
+	}
+	if applied:
+		db.session.flush()
+		for result, transaction, _, _, _ in applied:
+			result["transaction_id"] = transaction.id
+		if idem is None:
+			db.session.commit()
+		elif not idem.commit(body):
+			# A concurrent retry won; this attempt was rolled back
+			return _replayed(idem)
+		for result, _, user_id, delta, reason in applied:
+			invalidate_user(user_id)
+			send_balance_update(user_id, result["balance"], delta, reason)
+	return jsonify(body)
+
+
+@main_bp.post("/api/v1/scan")
+@login_required
+def api_scan():
+	"""Resolve a scanned QR payload and optionally change that user's balance.
+
+	Body: {"payload": "<QR text>", "delta": -5, "reason": "..."}; without a
+	delta it only looks the user up. One JSON round-trip replaces the form
+	post, redirect and dashboard render. Honours Idempotency-Key like the
+	other balance routes.
+	"""
+	if current_user.role not in (Role.ADMIN, Role.MANAGER):
+		return jsonify({"error": "Unauthorized"}), 403
+	try:
+		idem = begin_idempotent()
+	except ValueError as e:
+		return jsonify({"error": str(e)}), 422
+	if idem is not None and idem.replay is not None:
+		return _replayed(idem)
+
+	data = request.get_json(silent=True)
+	if not isinstance(data, dict):
+		return jsonify({"error": "Expected a JSON object"}), 400
+	# The QR codes encode the bare username
+	username = str(data.get("payload") or "").strip()
+	try:
+		delta = int(data.get("delta") or 0)
+	except (TypeError, ValueError):
+		return jsonify({"error": "delta must be an integer"}), 400
+	if not username:
+		return jsonify({"error": "Missing payload"}), 400
+	target = find_user(username)
+	if target is None:
+		return jsonify({"error": "User not found"}), 404
+
+	body = {"user_id": target.id, "username": target.username, "balance": target.balance, "applied": False}
+	if not delta:
+		return jsonify(body)
+
+	default_reason = "manager_scan" if current_user.role == Role.MANAGER else "admin_scan"
+	reason = str(data.get("reason") or default_reason)[:255]
+	transaction, success, message = change_balance(target, delta, reason=reason, commit=False)
+	body["balance"] = target.balance
+	if not success:
+		body["error"] = message
+		return jsonify(body), 409
+	db.session.flush()
+	body.update(applied=True, delta=delta, transaction_id=transaction.id)
+	if idem is None:
+		db.session.commit()
+	elif not idem.commit(body):
+		return _replayed(idem)
+	invalidate_user(target.id)
+	send_balance_update(target.id, body["balance"], delta, reason)
+	return jsonify(body)
+
+
+def _replayed(idem):
+	response = jsonify(idem.replay)
+	response.status_code = idem.status_code
+	response.headers["Idempotent-Replayed"] = "true"
+	return response
+
+
 @main_bp.post("/admin/set-role")
 @login_required
 def admin_set_role():
@@ -226,7 +576,7 @@ def admin_set_role():
 		return redirect(url_for("main.dashboard"))
 	username = request.form.get("username", "").strip()
 	role_str = request.form.get("role", "user")
-	target = User.query.filter_by(username=username).first()
+	target = find_user(username)
 	if not target:
 		flash("User not found", "danger")
 		return redirect(url_for("main.dashboard"))
@@ -234,9 +584,10 @@ def admin_set_role():
 		flash("Invalid role", "danger")
 		return redirect(url_for("main.dashboard"))
 	target.role = Role.MANAGER if role_str == "manager" else Role.USER
+	log_event("admin_set_role", resource=target.username, meta=f"role={role_str}")
 	db.session.commit()
+	invalidate_user(target.id)
 	flash("Role updated", "success")
-	log_event("admin_set_role", resource=target.username, meta=f"role={role_str}")
 	return redirect(url_for("main.dashboard"))
 
 
@@ -248,8 +599,6 @@ def admin_create_admin():
 		flash("Unauthorized", "danger")
 		return redirect(url_for("main.dashboard"))
 	
-	from werkzeug.security import generate_password_hash
-	
 	username = request.form.get("username", "").strip()
 	email = request.form.get("email", "").strip()
 	password = request.form.get("password", "").strip()
@@ -264,7 +613,7 @@ def admin_create_admin():
 		return redirect(url_for("main.dashboard"))
 	
 	# Check if username already exists
-	if User.query.filter_by(username=username).first():
+	if find_user(username):
 		flash("Username already exists", "danger")
 		return redirect(url_for("main.dashboard"))
 	
@@ -278,20 +627,20 @@ def admin_create_admin():
 		new_admin = User(
 			username=username,
 			email=email,
-			password_hash=generate_password_hash(password),
+			password_hash=hash_password(password),
 			role=Role.ADMIN,
 			balance=0.0
 		)
 		db.session.add(new_admin)
+		log_event("admin_created", resource=username, meta=f"created_by={current_user.username}")
 		db.session.commit()
 		
 		flash(f"Admin '{username}' created successfully", "success")
-		log_event("admin_created", resource=username, meta=f"created_by={current_user.username}")
 		
 	except Exception as e:
 		db.session.rollback()
 		flash(f"Error creating admin: {str(e)}", "danger")
-		print(f"DEBUG: Error creating admin: {e}")
+		current_app.logger.exception("Error creating admin", extra={"username": username})
 	
 	return redirect(url_for("main.dashboard"))
 
@@ -302,76 +651,19 @@ def admin_bulk_import():
 	if current_user.role != Role.ADMIN:
 		flash("Unauthorized", "danger")
 		return redirect(url_for("main.dashboard"))
-	from openpyxl import load_workbook
-	from werkzeug.utils import secure_filename
-	from werkzeug.security import generate_password_hash
-	from .models import generate_password_from_name
+	from .bulk_import import read_participants
 
 	upload = request.files.get("file")
 	if not upload:
 		flash("No file uploaded", "danger")
 		return redirect(url_for("main.dashboard"))
 
-	wb = load_workbook(upload)
-	ws = wb.active
-	participants = []
-
-	# Map headers (case-insensitive) so we can find the 'email' column safely
-	header_row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True))
-	# Build a lookup like {'email': idx, 'name': idx}
-	header_to_index = {}
-	for idx, header_value in enumerate(header_row):
-		if header_value is None:
-			continue
-		normalized = str(header_value).strip().lower()
-		header_to_index[normalized] = idx
-
-	# Accept common variants
-	email_header_candidates = [
-		"email",
-		"e-mail",
-		"mail",
-	]
-	name_header_candidates = [
-		"name",
-		"full name",
-		"fullname",
-		"participant name",
-	]
-
-	# Resolve indices
-	email_idx = next((header_to_index[h] for h in email_header_candidates if h in header_to_index), None)
-	name_idx = next((header_to_index[h] for h in name_header_candidates if h in header_to_index), None)
-
-	if email_idx is None:
-		flash("Could not find 'email' column in the uploaded file.", "danger")
+	try:
+		participants = read_participants(upload)
+	except ValueError as e:
+		flash(str(e), "danger")
 		return redirect(url_for("main.dashboard"))
 
-	for row in ws.iter_rows(min_row=2, values_only=True):
-		row_values = list(row)
-		email = row_values[email_idx] if email_idx < len(row_values) else None
-		name = row_values[name_idx] if (name_idx is not None and name_idx < len(row_values)) else None
-
-		# Skip rows without email
-		if not email:
-			continue
-
-		# Derive username: prefer cleaned name; fallback to email local-part
-		if name:
-			username = str(name).strip().replace(" ", "").lower()
-		else:
-			username = str(email).split("@")[0].strip().replace(" ", "").lower()
-
-		password_plain = generate_password_from_name(username)
-
-		participants.append({
-			'name': name,
-			'email': email,
-			'username': username,
-			'password': password_plain,
-			'exists': User.query.filter_by(username=username).first() is not None
-		})
-
 	return render_template("bulk_import_preview.html", participants=participants)
 
 
@@ -385,32 +677,57 @@ def admin_download_credentials():
 	
 	import csv
 	import io
+	import zlib
 	from datetime import datetime
 	
-	# Get all users
-	users = User.query.all()
-	
-	# Create CSV content
-	output = io.StringIO()
-	writer = csv.writer(output)
-	
-	# Write header
-	writer.writerow(['Username', 'Email', 'Role', 'Balance', 'Created At'])
+	use_gzip = request.accept_encodings["gzip"] > 0 and request.args.get("gzip") != "0"
 	
-	# Write user data
-	for user in users:
-		writer.writerow([
-			user.username,
-			user.email or '',
-			user.role.value if user.role else '',
-			user.balance,
-			user.created_at.strftime('%Y-%m-%d %H:%M:%S') if user.created_at else ''
-		])
+	def generate():
+		buf = io.StringIO()
+		writer = csv.writer(buf)
+		compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if use_gzip else None
+		
+		def drain():
+			data = buf.getvalue().encode("utf-8")
+			buf.seek(0)
+			buf.truncate()
+			return compressor.compress(data) if compressor else data
+		
+		# Write header
+		writer.writerow(['Username', 'Email', 'Role', 'Balance', 'Created At'])
+		
+		# Only the exported columns, read through a server-side cursor
+		rows = db.session.execute(
+			select(User.username, User.email, User.role, User.balance, User.created_at)
+			.order_by(User.id)
+			.execution_options(yield_per=1000)
+		)
+		
+		# Write user data, sending the body in ~64KB pieces
+		for username, email, role, balance, created_at in rows:
+			writer.writerow([
+				username,
+				email or '',
+				role.value if role else '',
+				balance,
+				created_at.strftime('%Y-%m-%d %H:%M:%S') if created_at else ''
+			])
+			if buf.tell() >= 65536:
+				chunk = drain()
+				if chunk:
+					yield chunk
+		chunk = drain()
+		if compressor:
+			chunk += compressor.flush()
+		if chunk:
+			yield chunk
 	
 	# Create response
-	response = make_response(output.getvalue())
-	response.headers['Content-Type'] = 'text/csv'
+	response = Response(stream_with_context(generate()), mimetype='text/csv')
 	response.headers['Content-Disposition'] = f'attachment; filename=user_credentials_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+	if use_gzip:
+		response.headers['Content-Encoding'] = 'gzip'
+	response.headers['Vary'] = 'Accept-Encoding'
 	
 	return response
 
@@ -421,8 +738,7 @@ def admin_bulk_import_confirm():
 	if current_user.role != Role.ADMIN:
 		flash("Unauthorized", "danger")
 		return redirect(url_for("main.dashboard"))
-	from werkzeug.security import generate_password_hash
-	from .models import generate_password_from_name
+	from .bulk_import import create_participants
 
 	# Get participants data from form
 	participants_list = request.form.getlist("participants")
@@ -440,63 +756,25 @@ def admin_bulk_import_confirm():
 				participant = json.loads(clean_data)
 				participants.append(participant)
 		except json.JSONDecodeError as e:
-			print(f"DEBUG: JSON decode error: {e}")
-			print(f"DEBUG: Problematic data: {repr(participant_data)}")
+			# Never log the row itself: it carries the generated password
+			current_app.logger.warning("Skipping undecodable bulk import row", extra={"error": str(e)})
 			continue
 	
-	print(f"DEBUG: Total participants to process: {len(participants)}")
-	created = 0
-	emails_sent = 0
+	current_app.logger.debug("Bulk import confirmed", extra={"participants": len(participants)})
+	result = create_participants(participants)
+	created = result.created
+	emails_sent = result.emails_queued
+	
+	# Report individual failures without hiding the overall outcome
+	failed = result.failed
+	for row in failed[:10]:
+		flash(f"Could not create {row.username or row.email}: {row.error}", "warning")
+	if len(failed) > 10:
+		flash(f"... and {len(failed) - 10} more rows failed", "warning")
+	for row in result.rows:
+		if row.status == "created" and row.email and not row.email_queued:
+			flash(f"{row.username}: {row.error}", "warning")
 	
-	for participant in participants:
-		print(f"DEBUG: Processing participant: {participant}")
-		if participant['exists']:
-			continue
-			
-		# Create user
-		print(f"DEBUG: Creating user with username: {participant['username']}, email: {participant['email']}")
-		user = User(
-			username=participant['username'],
-			email=participant['email'],
-			password_hash=generate_password_hash(participant['password']),
-			role=Role.USER,
-			balance=0.0
-		)
-		db.session.add(user)
-		db.session.commit()
-		ensure_qr_for_user(user)
-		
-		# Debug logging
-		print(f"DEBUG: Created user - username: {participant['username']}, password: {participant['password']}")
-		print(f"DEBUG: Password hash: {user.password_hash}")
-		print(f"DEBUG: Password check: {check_password_hash(user.password_hash, participant['password'])}")
-		
-		# Send email asynchronously
-		if participant['email']:
-			try:
-				# Try async email sending first
-				from .celery_app import send_email_async
-				task = send_email_async.delay(participant['email'], participant['username'], participant['password'])
-				print(f"DEBUG: Email queued for {participant['email']} (task: {task.id})")
-				emails_sent += 1
-			except ImportError:
-				# Fallback to synchronous email if Celery not available
-				try:
-					print(f"DEBUG: Attempting to send email to {participant['email']}")
-					send_credentials_email(participant['email'], participant['username'], participant['password'])
-					print(f"DEBUG: Email sent successfully to {participant['email']}")
-					emails_sent += 1
-				except Exception as e:
-					print(f"DEBUG: Failed to send email to {participant['email']}: {e}")
-					import traceback
-					traceback.print_exc()
-					flash(f"Failed to send email to {participant['email']}: {str(e)}", "warning")
-			except Exception as e:
-				print(f"DEBUG: Failed to queue email for {participant['email']}: {e}")
-				flash(f"Failed to queue email for {participant['email']}: {str(e)}", "warning")
-		
-		created += 1
-
 	flash(f"Created {created} users and sent {emails_sent} emails", "success")
 	log_event("admin_bulk_import", resource="users", meta=f"created={created}, emails_sent={emails_sent}")
 	return redirect(url_for("main.dashboard"))
@@ -548,194 +826,128 @@ def admin_bulk_import_download():
 	response.headers["Content-Disposition"] = "attachment; filename=bulk_import_preview.csv"
 	return response
 
+def _monitor_limits():
+	"""Max size and status thresholds from env (defaults for Railway free)"""
+	max_db_size_mb = int(os.environ.get("DB_MAX_SIZE_MB", 1024))  # default 1GB
+	warn_threshold = float(os.environ.get("DB_WARN_THRESHOLD", 75))
+	critical_threshold = float(os.environ.get("DB_CRITICAL_THRESHOLD", 90))
+	return max_db_size_mb, warn_threshold, critical_threshold
+
+
+def _usage_percentage(sample, max_db_size_mb):
+	db_size_bytes = sample.get("db_size_bytes") or 0
+	return (db_size_bytes / (max_db_size_mb * 1024 * 1024)) * 100
+
+
 @main_bp.get("/admin/database-monitor")
 @login_required
 def admin_database_monitor():
-	"""Database monitoring dashboard for admin only"""
+	"""Database monitoring dashboard for admin only, served from the background sampler"""
 	if current_user.role != Role.ADMIN:
 		flash("Unauthorized", "danger")
 		return redirect(url_for("main.dashboard"))
 	
-	try:
-		# Get database connection info
-		database_url = os.environ.get("DATABASE_URL")
-		if not database_url:
-			# Fallback to individual components
-			db_host = os.environ.get("DB_HOST", "localhost")
-			db_port = os.environ.get("DB_PORT", "5432")
-			db_name = os.environ.get("DB_NAME", "token_wallet")
-			db_user = os.environ.get("DB_USER", "wallet_user")
-			db_password = os.environ.get("DB_PASSWORD", "password")
-			database_url = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-		
-		# Limits and thresholds from env (defaults for Railway free)
-		max_db_size_mb = int(os.environ.get("DB_MAX_SIZE_MB", 1024))  # default 1GB
-		warn_threshold = float(os.environ.get("DB_WARN_THRESHOLD", 75))
-		critical_threshold = float(os.environ.get("DB_CRITICAL_THRESHOLD", 90))
-		
-		# Connect to database for monitoring
-		conn = psycopg2.connect(database_url)
-		cursor = conn.cursor()
-		
-		# Get database size
-		cursor.execute(
-			"""
-			SELECT pg_size_pretty(pg_database_size(current_database())) as db_size,
-			       pg_database_size(current_database()) as db_size_bytes
-			"""
-		)
-		db_size_result = cursor.fetchone()
-		db_size_pretty = db_size_result[0] if db_size_result else "Unknown"
-		db_size_bytes = db_size_result[1] if db_size_result else 0
-		
-		# Get table sizes
-		cursor.execute(
-			"""
-			SELECT 
-				schemaname,
-				tablename,
-				pg_size_pretty(pg_total_relation_size(schemaname||'.'||tablename)) as size,
-				pg_total_relation_size(schemaname||'.'||tablename) as size_bytes,
-				pg_stat_get_tuples_returned(c.oid) as row_count
-			FROM pg_tables pt
-			JOIN pg_class c ON c.relname = pt.tablename
-			WHERE schemaname = 'public'
-			ORDER BY pg_total_relation_size(schemaname||'.'||tablename) DESC
-			"""
-		)
-		table_sizes = cursor.fetchall()
-		
-		# Get connection info
-		cursor.execute(
-			"""
-			SELECT 
-				count(*) as total_connections,
-				count(*) FILTER (WHERE state = 'active') as active_connections,
-				count(*) FILTER (WHERE state = 'idle') as idle_connections
-			FROM pg_stat_activity 
-			WHERE datname = current_database()
-			"""
-		)
-		connection_info = cursor.fetchone()
-		
-		# Get user count
-		user_count = User.query.count()
-		
-		# Get recent activity (last 24 hours)
-		cursor.execute(
-			"""
-			SELECT 
-				date_trunc('hour', created_at) as hour,
-				count(*) as transactions
-			FROM transaction 
-			WHERE created_at >= NOW() - INTERVAL '24 hours'
-			GROUP BY date_trunc('hour', created_at)
-			ORDER BY hour DESC
-			LIMIT 24
-			"""
-		)
-		recent_activity = cursor.fetchall()
-		
-		# Calculate usage percentage with env-based max size
-		max_db_size_bytes = max_db_size_mb * 1024 * 1024
-		usage_percentage = (db_size_bytes / max_db_size_bytes) * 100 if db_size_bytes > 0 else 0
-		
-		# Determine status using env thresholds
-		if usage_percentage >= critical_threshold:
-			status = "CRITICAL"
-			status_color = "danger"
-		elif usage_percentage >= warn_threshold:
-			status = "WARNING"
-			status_color = "warning"
-		elif usage_percentage >= 50:
-			status = "MODERATE"
-			status_color = "info"
-		else:
-			status = "HEALTHY"
-			status_color = "success"
-		
-		cursor.close()
-		conn.close()
-		
-		return render_template(
-			"admin_database_monitor.html",
-			db_size=db_size_pretty,
-			db_size_bytes=db_size_bytes,
-			usage_percentage=usage_percentage,
-			max_db_size_mb=max_db_size_mb,
-			status=status,
-			status_color=status_color,
-			table_sizes=table_sizes,
-			connection_info=connection_info,
-			user_count=user_count,
-			recent_activity=recent_activity
-		)
-		
-	except Exception as e:
-		flash(f"Database monitoring error: {str(e)}", "danger")
+	sample = db_sampler.latest()
+	if "error" in sample:
+		flash(f"Database monitoring error: {sample['error']}", "danger")
 		return redirect(url_for("main.dashboard"))
+	
+	max_db_size_mb, warn_threshold, critical_threshold = _monitor_limits()
+	db_size_bytes = sample.get("db_size_bytes") or 0
+	usage_percentage = _usage_percentage(sample, max_db_size_mb)
+	
+	# Determine status using env thresholds
+	if usage_percentage >= critical_threshold:
+		status = "CRITICAL"
+		status_color = "danger"
+	elif usage_percentage >= warn_threshold:
+		status = "WARNING"
+		status_color = "warning"
+	elif usage_percentage >= 50:
+		status = "MODERATE"
+		status_color = "info"
+	else:
+		status = "HEALTHY"
+		status_color = "success"
+	
+	# Get recent activity (last 24 hours) from the hourly rollups
+	recent_activity = [(hour, transactions) for hour, transactions, _, _ in hourly_activity(24)]
+	
+	return render_template(
+		"admin_database_monitor.html",
+		db_size=format_bytes(db_size_bytes),
+		db_size_bytes=db_size_bytes,
+		usage_percentage=usage_percentage,
+		max_db_size_mb=max_db_size_mb,
+		status=status,
+		status_color=status_color,
+		table_sizes=[dict(table, size=format_bytes(table["size_bytes"])) for table in sample.get("tables", [])],
+		connection_info=sample.get("connections"),
+		user_count=sample.get("user_count"),
+		recent_activity=recent_activity,
+		sampled_at=sample["timestamp"],
+	)
 
 
 @main_bp.get("/admin/database-monitor/api")
 @login_required
 def admin_database_monitor_api():
-	"""API endpoint for real-time database monitoring"""
+	"""API endpoint polled by the monitor page: the latest sample plus the sampled trend"""
 	if current_user.role != Role.ADMIN:
 		return jsonify({"error": "Unauthorized"}), 403
 	
+	sample = db_sampler.latest()
+	if "error" in sample:
+		return jsonify({"error": sample["error"]}), 500
+	
+	max_db_size_mb, warn_threshold, critical_threshold = _monitor_limits()
+	db_size_bytes = sample.get("db_size_bytes") or 0
+	usage_percentage = _usage_percentage(sample, max_db_size_mb)
+	connections = sample.get("connections") or {}
+	
+	return jsonify({
+		"db_size_bytes": db_size_bytes,
+		"db_size_pretty": f"{db_size_bytes / (1024*1024):.2f} MB",
+		"usage_percentage": round(usage_percentage, 2),
+		"connection_count": connections.get("total", 0),
+		"user_count": sample.get("user_count"),
+		"transactions_24h": sum(row[1] for row in hourly_activity(24)),
+		"status": "CRITICAL" if usage_percentage >= critical_threshold else "WARNING" if usage_percentage >= warn_threshold else "HEALTHY",
+		"timestamp": sample["timestamp"],
+		"history": [
+			{
+				"timestamp": s["timestamp"],
+				"db_size_bytes": s.get("db_size_bytes"),
+				"connection_count": (s.get("connections") or {}).get("total"),
+			}
+			for s in db_sampler.history()
+			if "error" not in s
+		],
+	})
+
+
+@main_bp.get("/api/stats/activity")
+@login_required
+def activity_stats():
+	"""Wallet activity from the rollup tables: per hour, per day and per manager.
+	Query params: hours (default 24, max 168), days (default 7, max 90)
+	"""
+	if current_user.role != Role.ADMIN:
+		return jsonify({"error": "Unauthorized"}), 403
 	try:
-		# Get database connection info
-		database_url = os.environ.get("DATABASE_URL")
-		if not database_url:
-			db_host = os.environ.get("DB_HOST", "localhost")
-			db_port = os.environ.get("DB_PORT", "5432")
-			db_name = os.environ.get("DB_NAME", "token_wallet")
-			db_user = os.environ.get("DB_USER", "wallet_user")
-			db_password = os.environ.get("DB_PASSWORD", "password")
-			database_url = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-		
-		# Limits and thresholds from env
-		max_db_size_mb = int(os.environ.get("DB_MAX_SIZE_MB", 1024))
-		warn_threshold = float(os.environ.get("DB_WARN_THRESHOLD", 75))
-		critical_threshold = float(os.environ.get("DB_CRITICAL_THRESHOLD", 90))
-		
-		conn = psycopg2.connect(database_url)
-		cursor = conn.cursor()
-		
-		# Get current database size
-		cursor.execute("SELECT pg_database_size(current_database())")
-		db_size_bytes = cursor.fetchone()[0]
-		
-		# Get connection count
-		cursor.execute(
-			"""
-			SELECT count(*) FROM pg_stat_activity 
-			WHERE datname = current_database()
-			"""
-		)
-		connection_count = cursor.fetchone()[0]
-		
-		# Get user count
-		user_count = User.query.count()
-		
-		# Calculate usage percentage
-		usage_percentage = (db_size_bytes / (max_db_size_mb * 1024 * 1024)) * 100
-		
-		cursor.close()
-		conn.close()
-		
-		return jsonify({
-			"db_size_bytes": db_size_bytes,
-			"db_size_pretty": f"{db_size_bytes / (1024*1024):.2f} MB",
-			"usage_percentage": round(usage_percentage, 2),
-			"connection_count": connection_count,
-			"user_count": user_count,
-			"status": "CRITICAL" if usage_percentage >= critical_threshold else "WARNING" if usage_percentage >= warn_threshold else "HEALTHY",
-			"timestamp": time.time()
-		})
-		
-	except Exception as e:
-		return jsonify({"error": str(e)}), 500
+		hours = min(max(int(request.args.get("hours", 24)), 1), 168)
+		days = min(max(int(request.args.get("days", 7)), 1), 90)
+	except ValueError:
+		return jsonify({"error": "Invalid hours or days"}), 400
+
+	def counts(row):
+		return {"transactions": int(row[1]), "credited": int(row[2]), "debited": int(row[3])}
+
+	return jsonify({
+		"hourly": [{"hour": row[0].isoformat(), **counts(row)} for row in hourly_activity(hours)],
+		"daily": [{"date": row[0].isoformat(), **counts(row)} for row in daily_activity(days)],
+		"managers": [{"username": row[0], **counts(row)} for row in performer_activity(hours)],
+	})
 
 
 # ===========================================
@@ -743,44 +955,9 @@ def admin_database_monitor_api():
 # ===========================================
 # This is a non-disruptive addition for real-time balance updates
 # If it causes any issues, it can be easily disabled
+# Cross-worker delivery lives in realtime.py; this is the SSE endpoint
 
 import json
-import threading
-import queue
-from flask import Response
-
-# Real-time update system using Server-Sent Events
-user_queues = {}  # Store queues for each user
-queue_lock = threading.Lock()
-
-def get_user_queue(user_id):
-	"""Get or create a queue for a specific user"""
-	with queue_lock:
-		if user_id not in user_queues:
-			user_queues[user_id] = queue.Queue()
-		return user_queues[user_id]
-
-def send_balance_update(user_id, new_balance, change_amount, reason):
-	"""Send balance update to a specific user (safe to call even if feature disabled)"""
-	try:
-		user_queue = get_user_queue(user_id)
-		update_data = {
-			'type': 'balance_update',
-			'new_balance': new_balance,
-			'change_amount': change_amount,
-			'reason': reason,
-			'timestamp': time.time()
-		}
-		user_queue.put(update_data)
-	except Exception as e:
-		# Silently fail to not disrupt existing functionality
-		pass
-
-def cleanup_user_queue(user_id):
-	"""Clean up queue when user disconnects"""
-	with queue_lock:
-		if user_id in user_queues:
-			del user_queues[user_id]
 
 @main_bp.get("/api/realtime/balance/<int:user_id>")
 @login_required
@@ -791,19 +968,20 @@ def realtime_balance_updates(user_id):
 		return jsonify({"error": "Unauthorized"}), 403
 	
 	def generate():
-		user_queue = get_user_queue(user_id)
+		# Each connection (tab) gets its own bounded subscription
+		subscription = realtime_hub.subscribe(user_id)
 		try:
-			while True:
-				try:
-					# Wait for updates with timeout
-					update_data = user_queue.get(timeout=30)
+			while not subscription.closed:
+				# Wait for updates with timeout
+				update_data = subscription.get(timeout=30)
+				if update_data is not None:
 					yield f"data: {json.dumps(update_data)}\n\n"
-				except queue.Empty:
+				else:
 					# Send keepalive
 					yield f"data: {json.dumps({'type': 'keepalive', 'timestamp': time.time()})}\n\n"
-		except GeneratorExit:
-			# Clean up when client disconnects
-			cleanup_user_queue(user_id)
+		finally:
+			# Clean up when client disconnects or the subscription is evicted
+			realtime_hub.unsubscribe(subscription)
 	
 	return Response(generate(), mimetype='text/event-stream', headers={
 		'Cache-Control': 'no-cache',
@@ -813,3 +991,70 @@ def realtime_balance_updates(user_id):
 	})
 
 
+@main_bp.get("/api/realtime/stats")
+@login_required
+def realtime_stats():
+	"""Connection and queue-depth counters for this worker's SSE subscriptions"""
+	if current_user.role != Role.ADMIN:
+		return jsonify({"error": "Unauthorized"}), 403
+	return jsonify(realtime_hub.registry.stats())
+
+
+@main_bp.get("/api/cache/stats")
+@login_required
+def cache_stats_api():
+	"""Hit, miss and coalesced-wait counters for this worker's cached reads"""
+	if current_user.role != Role.ADMIN:
+		return jsonify({"error": "Unauthorized"}), 403
+	return jsonify(cache_stats())
+
+
+@main_bp.get("/admin/profiles")
+@login_required
+def admin_profiles():
+	"""Routes with recorded request profiles and their sample counts.
+	Profile a request by sending it with the header "X-Profile: 1" as an admin.
+	"""
+	if current_user.role != Role.ADMIN:
+		return jsonify({"error": "Unauthorized"}), 403
+	return jsonify({
+		name: {
+			"samples": samples,
+			"folded": url_for("main.admin_profile_folded", name=name),
+			"flamegraph": url_for("main.admin_profile_flamegraph", name=name),
+		}
+		for name, samples in list_profiles().items()
+	})
+
+
+@main_bp.get("/admin/profiles/<name>.folded")
+@login_required
+def admin_profile_folded(name):
+	"""Aggregated collapsed stacks for one route (input for flamegraph.pl, speedscope, ...)"""
+	if current_user.role != Role.ADMIN:
+		return jsonify({"error": "Unauthorized"}), 403
+	stacks = load_profile(name)
+	if not stacks:
+		return jsonify({"error": "No profile recorded for this route"}), 404
+	body = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+	return Response(body, mimetype="text/plain")
+
+
+@main_bp.get("/admin/profiles/<name>.svg")
+@login_required
+def admin_profile_flamegraph(name):
+	if current_user.role != Role.ADMIN:
+		return jsonify({"error": "Unauthorized"}), 403
+	stacks = load_profile(name)
+	if not stacks:
+		return jsonify({"error": "No profile recorded for this route"}), 404
+	return Response(render_flamegraph(stacks, name), mimetype="image/svg+xml")
+
+
+@main_bp.post("/admin/profiles/<name>/clear")
+@login_required
+def admin_profile_clear(name):
+	if current_user.role != Role.ADMIN:
+		return jsonify({"error": "Unauthorized"}), 403
+	clear_profile(name)
+	return jsonify({"cleared": name})
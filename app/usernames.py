@@ -0,0 +1,165 @@
+"""
+Username lookups.
+
+Usernames match case-insensitively: bulk import lowercases them while
+registration keeps what was typed, and lookups go through the
+lower(username) index. Where two legacy accounts differ only in case, the
+exact spelling wins.
+
+Each worker also keeps a lower(username) -> id map, so hot lookups (every
+scan and balance post) become primary-key gets. The map is warmed at
+startup and kept current by ORM events: new users are added, while deletes
+and renames drop the entry and bump a generation in the shared cache, so
+other workers discard their maps too. Entries are checked against the row
+they load, so a stale one only costs a query.
+"""
+
+from __future__ import annotations
+
+import secrets
+
+from sqlalchemy import case, event, func, inspect, select
+
+from . import cache, db
+from .caching import current_generation
+from .models import User
+
+_GENERATION_KEY = "gen:usernames"
+
+
+def normalize_username(username: str | None) -> str:
+	return (username or "").strip().lower()
+
+
+def _shared_generation() -> str:
+	return current_generation(_GENERATION_KEY)
+
+
+class UsernameMap:
+	"""Per-worker lower(username) -> id map; ambiguous names are never cached."""
+
+	def __init__(self) -> None:
+		self._ids: dict[str, int] = {}
+		self._generation: str | None = None
+
+	def warm(self) -> None:
+		generation = _shared_generation()
+		ids: dict[str, int] = {}
+		ambiguous: set[str] = set()
+		for key, user_id in db.session.execute(select(func.lower(User.username), User.id)):
+			if key in ids:
+				ambiguous.add(key)
+			ids[key] = user_id
+		for key in ambiguous:
+			del ids[key]
+		self._ids = ids
+		self._generation = generation
+
+	def get(self, key: str) -> int | None:
+		if self._generation != _shared_generation():
+			self.warm()
+		return self._ids.get(key)
+
+	def add(self, key: str, user_id: int) -> None:
+		if self._ids.setdefault(key, user_id) != user_id:
+			del self._ids[key]
+
+	def discard(self, key: str) -> None:
+		self._ids.pop(key, None)
+
+	def invalidate(self, key: str) -> None:
+		"""Drop `key` here and make every worker drop its map."""
+		self.discard(key)
+		generation = secrets.token_hex(8)
+		cache.set(_GENERATION_KEY, generation, timeout=0)
+		self._generation = generation
+
+
+username_map = UsernameMap()
+
+
+def find_user(username: str | None) -> User | None:
+	"""The user for `username`, matched case-insensitively."""
+	key = normalize_username(username)
+	if not key:
+		return None
+	user_id = username_map.get(key)
+	if user_id is not None:
+		user = db.session.get(User, user_id)
+		if user is not None and user.username.lower() == key:
+			return user
+		username_map.discard(key)
+	# Prefer the exact spelling when legacy accounts differ only in case
+	exact_first = case((User.username == username.strip(), 0), else_=1)
+	stmt = select(User).where(func.lower(User.username) == key).order_by(exact_first, User.id).limit(2)
+	users = db.session.execute(stmt).scalars().all()
+	if len(users) == 1:
+		username_map.add(key, users[0].id)
+	return users[0] if users else None
+
+
+def find_user_id(username: str | None) -> int | None:
+	"""Like find_user, but a mapped id is checked by reading only its username."""
+	key = normalize_username(username)
+	user_id = username_map.get(key) if key else None
+	if user_id is not None:
+		# The map may predate a rename or delete on another worker
+		current = db.session.execute(select(User.username).where(User.id == user_id)).scalar_one_or_none()
+		if current is not None and current.lower() == key:
+			return user_id
+		username_map.discard(key)
+	user = find_user(username)
+	return user.id if user is not None else None
+
+
+def find_users(usernames) -> dict[str, User]:
+	"""{normalized username: User} for many names in one query."""
+	given = {(name or "").strip() for name in usernames}
+	keys = {normalize_username(name) for name in given} - {""}
+	if not keys:
+		return {}
+	stmt = select(User).where(func.lower(User.username).in_(keys))
+	found: dict[str, User] = {}
+	for user in db.session.execute(stmt).scalars():
+		key = user.username.lower()
+		if key in keys and (key not in found or user.username in given):
+			found[key] = user
+	return found
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_username_changes(session, flush_context) -> None:
+	changes = session.info.setdefault("_username_changes", [])
+	for obj in session.new:
+		if isinstance(obj, User):
+			changes.append(("add", obj.username.lower(), obj.id))
+	for obj in session.deleted:
+		if isinstance(obj, User):
+			changes.append(("drop", obj.username.lower(), obj.id))
+	for obj in session.dirty:
+		if isinstance(obj, User):
+			history = inspect(obj).attrs.username.history
+			if history.has_changes():
+				for old in history.deleted:
+					changes.append(("drop", old.lower(), obj.id))
+				changes.append(("add", obj.username.lower(), obj.id))
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_username_changes(session) -> None:
+	for op, key, user_id in session.info.pop("_username_changes", ()):
+		if op == "add":
+			username_map.add(key, user_id)
+		else:
+			username_map.invalidate(key)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_username_changes(session) -> None:
+	session.info.pop("_username_changes", None)
+
+
+def init_usernames(app) -> None:
+	"""Warm this process's map; forked workers inherit it."""
+	with app.app_context():
+		username_map.warm()
@@ -2,14 +2,19 @@ from __future__ import annotations
 
 import io
 import os
+from datetime import datetime
 
 import qrcode
 from flask import current_app
 from flask_login import current_user
+from sqlalchemy import select, update
+from sqlalchemy.orm.attributes import set_committed_value
 
 from . import db
 from .models import User, WalletTransaction
 from .audit import log_event
+from .caching import invalidate_user
+from .rollups import record_activity
 
 
 def ensure_qr_for_user(user: User) -> str:
@@ -22,19 +27,25 @@ def ensure_qr_for_user(user: User) -> str:
 	img = qrcode.make(str(user.username))
 	img.save(path)
 	user.qr_filename = filename
-	db.session.commit()
 	log_event("qr_generated", resource=user.username)
+	db.session.commit()
 	return filename
 
 
+def render_qr_png(payload: str) -> bytes:
+	"""Render the QR code for `payload` as PNG bytes."""
+	buf = io.BytesIO()
+	img = qrcode.make(payload)
+	img.save(buf, format="PNG")
+	return buf.getvalue()
+
+
 def generate_qr_data_uri(user: User) -> str:
 	"""Generate a QR code PNG as a data URI for the given user.
 	This avoids relying on ephemeral filesystem storage on platforms like Railway.
+	Pages should prefer the cacheable /qr/<username> endpoint.
 	"""
-	buf = io.BytesIO()
-	img = qrcode.make(str(user.username))
-	img.save(buf, format="PNG")
-	data = buf.getvalue()
+	data = render_qr_png(str(user.username))
 	try:
 		import base64
 		b64 = base64.b64encode(data).decode("ascii")
@@ -45,29 +56,50 @@ def generate_qr_data_uri(user: User) -> str:
 		return f"/static/qr_codes/{filename}"
 
 
-def change_balance(target_user: User, delta: int, reason: str | None = None) -> tuple[WalletTransaction | None, bool, str]:
+def change_balance(target_user: User, delta: int, reason: str | None = None, commit: bool = True) -> tuple[WalletTransaction | None, bool, str]:
 	"""
 	Change user balance with validation.
+	The balance is moved by a single conditional UPDATE ... RETURNING so the
+	non-negative check happens in the database and concurrent changes to the
+	same user cannot overwrite each other. The ledger row and its hourly
+	rollup are written in the same transaction.
+	With commit=False the caller commits, then calls invalidate_user.
 	Returns: (transaction, success, message)
 	"""
-	old_balance = target_user.balance
-	new_balance = old_balance + delta
+	stmt = (
+		update(User)
+		.where(User.id == target_user.id, User.balance + delta >= 0)
+		.values(balance=User.balance + delta)
+		.returning(User.balance)
+		.execution_options(synchronize_session=False)
+	)
+	new_balance = db.session.execute(stmt).scalar_one_or_none()
 	
-	# Check for negative balance
-	if new_balance < 0:
-		return None, False, f"Insufficient funds. Current balance: {old_balance}, attempted deduction: {abs(delta)}"
+	# Check for negative balance (or a user deleted underneath us)
+	if new_balance is None:
+		current_balance = db.session.execute(
+			select(User.balance).where(User.id == target_user.id)
+		).scalar_one_or_none()
+		if current_balance is None:
+			return None, False, "User not found"
+		set_committed_value(target_user, "balance", current_balance)
+		return None, False, f"Insufficient funds. Current balance: {current_balance}, attempted deduction: {abs(delta)}"
 	
-	target_user.balance = new_balance
+	performed_by_id = current_user.id if current_user.is_authenticated else target_user.id
+	created_at = datetime.utcnow()
 	tr = WalletTransaction(
 		user_id=target_user.id,
 		change_amount=delta,
 		balance_after=new_balance,
-		performed_by_id=current_user.id if current_user.is_authenticated else target_user.id,
+		performed_by_id=performed_by_id,
+		created_at=created_at,
 		reason=reason,
 	)
 	db.session.add(tr)
-	db.session.commit()
-	log_event("wallet_change", resource=target_user.username, meta=f"delta={delta};after={new_balance}")
+	record_activity(performed_by_id, delta, created_at)
+	log_event("wallet_change", resource=target_user.username, meta=f"delta={delta};after={new_balance}", commit=commit)
+	if commit:
+		db.session.commit()
+		invalidate_user(target_user.id)
+	set_committed_value(target_user, "balance", new_balance)
 	return tr, True, f"Balance updated successfully. New balance: {new_balance}"
-
-
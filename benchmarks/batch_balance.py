@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Balance changes per second through the single-item form route
+(POST /manager/update-balance, following its redirect to the dashboard as
+a browser does) and through POST /api/balance/batch at a few batch sizes,
+counting the SQL statements each change costs.
+
+	python benchmarks/batch_balance.py --items 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+
+from common import make_app, create_user, login, write_results
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--items", type=int, default=500, help="balance changes per variant")
+	parser.add_argument("--participants", type=int, default=50)
+	args = parser.parse_args()
+
+	app = make_app()
+	from sqlalchemy import event
+	from app import db
+	from app.models import Role
+
+	with app.app_context():
+		create_user("stall", role=Role.MANAGER)
+		for n in range(args.participants):
+			create_user(f"p{n}", balance=1_000_000)
+		engine = db.engine
+	statements = []
+	event.listen(engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+
+	client = app.test_client()
+	login(client, "stall")
+	items = [
+		{"username": f"p{n % args.participants}", "delta": 1 if n % 2 else -1, "reason": "bench"}
+		for n in range(args.items)
+	]
+
+	def single() -> None:
+		for item in items:
+			client.post("/manager/update-balance", data={
+				"username": item["username"],
+				"action": "add" if item["delta"] > 0 else "deduct",
+				"amount": abs(item["delta"]),
+			}, follow_redirects=True)
+
+	def batched(size: int):
+		def run() -> None:
+			for start in range(0, len(items), size):
+				response = client.post("/api/balance/batch", json={"items": items[start:start + size]})
+				assert response.json["failed"] == 0, response.json
+		return run
+
+	variants = {"single_item_route": single}
+	for size in (10, 100, 500):
+		if size <= args.items:
+			variants[f"batch_{size}"] = batched(size)
+
+	results = {}
+	for name, run in variants.items():
+		statements.clear()
+		started = time.perf_counter()
+		run()
+		elapsed = time.perf_counter() - started
+		results[name] = {
+			"items": args.items,
+			"seconds": elapsed,
+			"items_per_second": args.items / elapsed,
+			"statements_per_item": len(statements) / args.items,
+		}
+		print(f"{name:18s} {results[name]['items_per_second']:8.0f} items/s  {results[name]['statements_per_item']:.1f} statements/item")
+
+	base = results["single_item_route"]["items_per_second"]
+	for name in results:
+		results[name]["speedup"] = results[name]["items_per_second"] / base
+	print(f"results: {write_results('batch_balance', results)}")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Check that a balance change made in one process is never served stale by
+another process's cache.
+
+Several worker processes share one SQLite database and one cache backend.
+Each round they all read a user's cached identity (warming their cache), the
+parent changes the balance through change_balance(), and every worker reads
+again; any read that does not see the new balance is counted as stale.
+
+	python benchmarks/cache_coherence.py --backend filesystem --workers 4
+	python benchmarks/cache_coherence.py --backend simple      # expected to go stale
+	CACHE_REDIS_URL=redis://localhost:6379/0 python benchmarks/cache_coherence.py --backend redis
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+
+from common import make_app, create_user, write_results
+
+BACKENDS = {"simple": "simple", "filesystem": "FileSystemCache", "redis": "RedisCache"}
+
+
+def _configure(backend: str, cache_dir: str) -> None:
+	os.environ["CACHE_TYPE"] = BACKENDS[backend]
+	os.environ["CACHE_DIR"] = cache_dir
+	# Fresh namespace per run so a shared Redis never serves a previous run's keys
+	os.environ["CACHE_KEY_PREFIX"] = f"coherence-{os.path.basename(os.path.dirname(cache_dir))}:"
+	os.environ["IDENTITY_CACHE_TTL"] = "300"
+
+
+def _worker(backend: str, cache_dir: str, database_url: str, conn) -> None:
+	_configure(backend, cache_dir)
+	app = make_app(database_url)
+	from app.identity import load_identity
+
+	while True:
+		user_id = conn.recv()
+		if user_id is None:
+			return
+		with app.app_context():
+			conn.send(load_identity(user_id).balance)
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--backend", choices=sorted(BACKENDS), default="filesystem")
+	parser.add_argument("--workers", type=int, default=4)
+	parser.add_argument("--rounds", type=int, default=50)
+	args = parser.parse_args()
+
+	tmp_dir = tempfile.mkdtemp(prefix="wallet-coherence-")
+	cache_dir = os.path.join(tmp_dir, "cache")
+	database_url = f"sqlite:///{os.path.join(tmp_dir, 'coherence.db')}"
+	_configure(args.backend, cache_dir)
+
+	app = make_app(database_url)
+	from app import db
+	from app.models import User
+	from app.wallet import change_balance
+
+	with app.app_context():
+		user_id = create_user("coherence", balance=0).id
+
+	ctx = multiprocessing.get_context("spawn")
+	pipes, procs = [], []
+	for _ in range(args.workers):
+		parent_conn, child_conn = ctx.Pipe()
+		proc = ctx.Process(target=_worker, args=(args.backend, cache_dir, database_url, child_conn), daemon=True)
+		proc.start()
+		pipes.append(parent_conn)
+		procs.append(proc)
+
+	def read_all() -> list[int]:
+		for conn in pipes:
+			conn.send(user_id)
+		return [conn.recv() for conn in pipes]
+
+	stale = 0
+	try:
+		for round_no in range(1, args.rounds + 1):
+			read_all()  # every worker now holds the old balance in its cache
+			with app.test_request_context():
+				_, ok, message = change_balance(db.session.get(User, user_id), 1, reason="coherence")
+				assert ok, message
+			seen = read_all()
+			stale += sum(1 for balance in seen if balance != round_no)
+	finally:
+		for conn in pipes:
+			conn.send(None)
+		for proc in procs:
+			proc.join(timeout=10)
+
+	reads = args.rounds * args.workers
+	print(f"backend={args.backend} workers={args.workers} rounds={args.rounds} stale_reads={stale}/{reads}")
+	print(f"results: {write_results(f'cache_coherence_{args.backend}', {'workers': args.workers, 'rounds': args.rounds, 'reads': reads, 'stale_reads': stale})}")
+	# A per-process cache is expected to go stale; a shared one must not
+	return 1 if stale and args.backend != "simple" else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Count how often a hot key is recomputed when many requests find it missing
+at once, with plain get/set versus caching.get_or_compute.
+
+	python benchmarks/cache_stampede.py --threads 50 --rounds 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+import time
+
+from common import make_app, write_results
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--threads", type=int, default=50)
+	parser.add_argument("--rounds", type=int, default=20)
+	parser.add_argument("--compute-ms", type=float, default=20.0, help="simulated recompute cost")
+	args = parser.parse_args()
+
+	app = make_app()
+	from app import cache
+	from app.caching import counters, get_or_compute, invalidate_user, user_key
+
+	computes = 0
+	lock = threading.Lock()
+
+	def compute():
+		nonlocal computes
+		with lock:
+			computes += 1
+		time.sleep(args.compute_ms / 1000.0)
+		return {"balance": 1}
+
+	def naive(key):
+		if cache.get(key) is None:
+			cache.set(key, compute(), timeout=300)
+
+	def single_flight(key):
+		get_or_compute(key, compute, timeout=300)
+
+	results = {}
+	for label, read in (("get_set", naive), ("single_flight", single_flight)):
+		computes = 0
+		for name in counters:
+			counters[name] = 0
+		started = time.perf_counter()
+		for _ in range(args.rounds):
+			with app.app_context():
+				invalidate_user(1)
+				key = user_key(1, "user_data")
+			barrier = threading.Barrier(args.threads)
+
+			def request():
+				barrier.wait()
+				with app.app_context():
+					read(key)
+
+			threads = [threading.Thread(target=request) for _ in range(args.threads)]
+			for t in threads:
+				t.start()
+			for t in threads:
+				t.join()
+		elapsed = time.perf_counter() - started
+		results[label] = {
+			"recomputes_per_invalidation": computes / args.rounds,
+			"elapsed_s": elapsed,
+			**({"counters": dict(counters)} if label == "single_flight" else {}),
+		}
+		print(f"{label:14s} recomputes/invalidation={computes / args.rounds:.1f} elapsed={elapsed:.2f}s")
+
+	print(f"results: {write_results('cache_stampede', results)}")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Shared helpers for the scripts in this directory.
+Every script builds its own app against a throwaway SQLite file (or the
+database given in BENCH_DATABASE_URL) so runs never touch real data.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+	sys.path.insert(0, ROOT)
+
+
+def make_app(database_url: str | None = None):
+	"""Create the Flask app against an isolated database.
+	Must run before anything imports `config`, which reads the URL at import time.
+	"""
+	database_url = database_url or os.environ.get("BENCH_DATABASE_URL")
+	if not database_url:
+		tmp_dir = tempfile.mkdtemp(prefix="wallet-bench-")
+		database_url = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+	os.environ["FLASK_ENV"] = "development"
+	os.environ["DEV_DATABASE_URL"] = database_url
+	# No background monitor queries mixed into the statements scripts count
+	os.environ.setdefault("DB_MONITOR_INTERVAL", "0")
+
+	from app import create_app
+	app = create_app()
+	app.config["TESTING"] = True
+	return app
+
+
+def create_user(username: str, *, role=None, balance: int = 0, password: str = "password"):
+	"""Insert a user directly; call inside an app context."""
+	from werkzeug.security import generate_password_hash
+	from app import db
+	from app.models import User, Role
+
+	user = User(
+		username=username,
+		email=f"{username}@example.com",
+		password_hash=generate_password_hash(password),
+		role=role or Role.USER,
+		balance=balance,
+	)
+	db.session.add(user)
+	db.session.commit()
+	return user
+
+
+def login(client, username: str, password: str = "password") -> None:
+	response = client.post("/auth/login", data={"username": username, "password": password})
+	assert response.status_code == 302, f"login failed for {username}"
+
+
+def time_calls(fn, iterations: int, warmup: int = 5) -> list[float]:
+	"""Run `fn` repeatedly and return per-call wall times in milliseconds."""
+	for _ in range(warmup):
+		fn()
+	samples = []
+	for _ in range(iterations):
+		started = time.perf_counter()
+		fn()
+		samples.append((time.perf_counter() - started) * 1000.0)
+	return samples
+
+
+def summarize(samples: list[float]) -> dict:
+	ordered = sorted(samples)
+
+	def pct(p: float) -> float:
+		return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+	return {
+		"count": len(ordered),
+		"min_ms": ordered[0],
+		"mean_ms": statistics.fmean(ordered),
+		"median_ms": pct(50),
+		"p95_ms": pct(95),
+		"p99_ms": pct(99),
+		"max_ms": ordered[-1],
+	}
+
+
+def write_results(name: str, results: dict) -> str:
+	"""Store results as benchmarks/results/<name>.json and return the path."""
+	out_dir = os.path.join(ROOT, "benchmarks", "results")
+	os.makedirs(out_dir, exist_ok=True)
+	path = os.path.join(out_dir, f"{name}.json")
+	payload = {
+		"benchmark": name,
+		"timestamp": time.time(),
+		"python": sys.version.split()[0],
+		"results": results,
+	}
+	with open(path, "w") as fh:
+		json.dump(payload, fh, indent=2)
+	return path
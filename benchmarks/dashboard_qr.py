@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Compare participant dashboard latency with the QR inlined as a data URI
+(the old view) against the cached /qr/<username> endpoint.
+
+	python benchmarks/dashboard_qr.py --iterations 200
+
+"new_dashboard_revisit" is what a returning browser pays: the HTML plus a
+conditional image request answered with 304.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from common import make_app, create_user, login, time_calls, summarize, write_results
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--iterations", type=int, default=200)
+	args = parser.parse_args()
+
+	app = make_app()
+	from flask import render_template
+	from flask_login import login_required, current_user
+	from app.wallet import generate_qr_data_uri
+
+	@login_required
+	def legacy_dashboard():
+		qr_data_uri = generate_qr_data_uri(current_user)
+		return render_template("user_dashboard.html", qr_filename=None, qr_url=qr_data_uri, balance=current_user.balance)
+
+	app.add_url_rule("/bench/legacy-dashboard", "bench_legacy_dashboard", legacy_dashboard)
+
+	with app.app_context():
+		create_user("viewer", balance=25)
+
+	client = app.test_client()
+	login(client, "viewer")
+
+	def old():
+		response = client.get("/bench/legacy-dashboard")
+		assert response.status_code == 200
+
+	def new_first_visit():
+		page = client.get("/dashboard")
+		assert page.status_code == 200
+		image = client.get("/qr/viewer")
+		assert image.status_code == 200
+
+	etag = client.get("/qr/viewer").headers["ETag"]
+
+	def new_revisit():
+		page = client.get("/dashboard")
+		assert page.status_code == 200
+		image = client.get("/qr/viewer", headers={"If-None-Match": etag})
+		assert image.status_code == 304
+
+	legacy_size = len(client.get("/bench/legacy-dashboard").data)
+	new_size = len(client.get("/dashboard").data)
+
+	results = {
+		"old_dashboard_data_uri": summarize(time_calls(old, args.iterations)),
+		"new_dashboard_first_visit": summarize(time_calls(new_first_visit, args.iterations)),
+		"new_dashboard_revisit": summarize(time_calls(new_revisit, args.iterations)),
+		"html_bytes": {"old": legacy_size, "new": new_size},
+	}
+	for name, stats in results.items():
+		if "median_ms" in stats:
+			print(f"{name:28s} median={stats['median_ms']:.2f}ms p95={stats['p95_ms']:.2f}ms")
+	print(f"html bytes: old={legacy_size} new={new_size}")
+	print(f"results: {write_results('dashboard_qr', results)}")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Count database queries and time per authenticated request with the
+identity cache off (IDENTITY_CACHE_TTL=0, the old User.query.get path)
+and on. The identity cache needs a shared backend, so this runs on
+FileSystemCache.
+
+	python benchmarks/identity_loader.py --iterations 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+
+from common import make_app, create_user, login, time_calls, summarize, write_results
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--iterations", type=int, default=200)
+	args = parser.parse_args()
+
+	os.environ["CACHE_TYPE"] = "FileSystemCache"
+	os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="wallet-bench-cache-")
+	app = make_app()
+	from sqlalchemy import event
+	from app import db
+	from app.models import Role
+
+	with app.app_context():
+		create_user("viewer", balance=10)
+		create_user("stall", role=Role.MANAGER)
+		engine = db.engine
+
+	statements = []
+	event.listen(engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+
+	paths = {
+		"participant_dashboard": ("viewer", "/dashboard"),
+		"manager_dashboard": ("stall", "/dashboard"),
+		"qr_image": ("viewer", "/qr/viewer"),
+	}
+	results = {}
+	for label, ttl in (("uncached", 0), ("cached", 30)):
+		app.config["IDENTITY_CACHE_TTL"] = ttl
+		for name, (username, path) in paths.items():
+			client = app.test_client()
+			login(client, username)
+			client.get(path)  # warm the cache entry
+
+			statements.clear()
+			for _ in range(args.iterations):
+				client.get(path)
+			queries = len(statements) / args.iterations
+
+			timings = summarize(time_calls(lambda: client.get(path), args.iterations))
+			results[f"{name}_{label}"] = {"queries_per_request": queries, **timings}
+			print(f"{name:22s} {label:8s} queries/request={queries:.2f} median={timings['median_ms']:.2f}ms")
+
+	print(f"results: {write_results('identity_loader', results)}")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Scenario-driven load test that writes load_test_results.json-style output.
+
+Virtual users run concurrently against a locally started app (a threaded
+Werkzeug server on a throwaway SQLite file, or BENCH_DATABASE_URL such as a
+local Postgres) or against --url:
+
+  light user        landing page, login, dashboard
+  active user       login, dashboard x3, QR image
+  manager           login, then credits and debits a participant per round
+  SSE subscriber    subscribes to its balance stream and waits for the
+                    credit a manager sends it (delivery latency)
+
+All times are in seconds, as in the files at the repo root. Per-user
+response time is the mean of that user's request latencies.
+
+	python benchmarks/load_test.py --users 200 --concurrency 50
+	python benchmarks/load_test.py --save-baseline           # store as the baseline
+	python benchmarks/load_test.py --fail-on-regression      # diff against it; exit 1 on regressions
+
+--url targets an existing deployment; its users must already exist with
+--password (participants lt_user_<n>, managers lt_manager_<n>). The SSE
+scenario needs the seeded user ids, so it only runs against the local app.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from common import ROOT, make_app
+
+BASELINE_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+DEFAULT_BASELINE = os.path.join(BASELINE_DIR, "load_test_sqlite.json")
+DEFAULT_OUTPUT = os.path.join(ROOT, "benchmarks", "results", "load_test_results.json")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+	"""Record 302s as responses, like the original runs did."""
+
+	def redirect_request(self, *args, **kwargs):
+		return None
+
+
+class Recorder:
+	def __init__(self) -> None:
+		self.lock = threading.Lock()
+		self.samples: list[float] = []
+		self.by_step: dict[str, list[float]] = defaultdict(list)
+		self.status_codes: Counter = Counter()
+
+	def add(self, step: str, elapsed: float, status: int | str) -> None:
+		with self.lock:
+			self.samples.append(elapsed)
+			self.by_step[step].append(elapsed)
+			self.status_codes[str(status)] += 1
+
+
+class VirtualUser:
+	"""One browser: its own cookie jar and request timings."""
+
+	def __init__(self, base_url: str, recorder: Recorder) -> None:
+		self.base_url = base_url.rstrip("/")
+		self.recorder = recorder
+		self.opener = urllib.request.build_opener(
+			urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+		)
+		self.timings: list[float] = []
+		self.failed = False
+
+	def request(self, step: str, path: str, data: dict | None = None, expect=(200, 302)) -> int:
+		body = urllib.parse.urlencode(data).encode() if data is not None else None
+		started = time.perf_counter()
+		try:
+			with self.opener.open(self.base_url + path, data=body, timeout=60) as response:
+				response.read()
+				status = response.status
+		except urllib.error.HTTPError as e:
+			status = e.code
+		except Exception as e:
+			status = type(e).__name__
+		elapsed = time.perf_counter() - started
+		self.timings.append(elapsed)
+		self.recorder.add(step, elapsed, status)
+		if status not in expect:
+			self.failed = True
+		return status if isinstance(status, int) else 0
+
+	def login(self, username: str, password: str) -> None:
+		self.request("login", "/auth/login", {"username": username, "password": password}, expect=(302,))
+
+
+def light_user(base_url, recorder, index, args) -> VirtualUser:
+	user = VirtualUser(base_url, recorder)
+	user.request("landing", "/")
+	user.login(f"lt_user_{index % args.participants}", args.password)
+	user.request("dashboard", "/dashboard")
+	return user
+
+
+def active_user(base_url, recorder, index, args) -> VirtualUser:
+	user = VirtualUser(base_url, recorder)
+	username = f"lt_user_{index % args.participants}"
+	user.login(username, args.password)
+	for _ in range(3):
+		user.request("dashboard", "/dashboard")
+	user.request("qr_image", f"/qr/{username}")
+	return user
+
+
+def manager_user(base_url, recorder, index, args) -> VirtualUser:
+	user = VirtualUser(base_url, recorder)
+	user.login(f"lt_manager_{index % args.managers}", args.password)
+	for _ in range(args.rounds):
+		target = f"lt_user_{random.randrange(args.participants)}"
+		user.request("manager_credit", "/manager/update-balance", {"username": target, "action": "add", "amount": 5})
+		user.request("manager_debit", "/manager/update-balance", {"username": target, "action": "deduct", "amount": 5})
+	return user
+
+
+def sse_user(base_url, recorder, index, args) -> VirtualUser:
+	"""Subscribe to our own balance stream, have a manager credit us and time delivery."""
+	user = VirtualUser(base_url, recorder)
+	username = f"lt_sse_{index}"
+	user.login(username, args.password)
+	jar = next(h.cookiejar for h in user.opener.handlers if isinstance(h, urllib.request.HTTPCookieProcessor))
+	cookie = "; ".join(f"{c.name}={c.value}" for c in jar)
+	parsed = urllib.parse.urlsplit(base_url)
+	conn_cls = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+	conn = conn_cls(parsed.netloc, timeout=args.sse_timeout)
+	user_id = args.sse_user_ids[index]
+	delivered = threading.Event()
+
+	def read_stream() -> None:
+		try:
+			conn.request("GET", f"/api/realtime/balance/{user_id}", headers={"Cookie": cookie, "Accept": "text/event-stream"})
+			response = conn.getresponse()
+			for raw in response:
+				if raw.startswith(b"data:") and b"balance_update" in raw:
+					delivered.set()
+					return
+		except Exception:
+			pass
+
+	reader = threading.Thread(target=read_stream, daemon=True)
+	reader.start()
+	time.sleep(0.5)  # let the subscription register before the credit is sent
+	manager = VirtualUser(base_url, recorder)
+	manager.login(f"lt_manager_{index % args.managers}", args.password)
+	started = time.perf_counter()
+	manager.request("sse_trigger_credit", "/manager/update-balance", {"username": username, "action": "add", "amount": 1})
+	if delivered.wait(args.sse_timeout):
+		elapsed = time.perf_counter() - started
+		user.timings.append(elapsed)
+		recorder.add("sse_delivery", elapsed, 200)
+	else:
+		user.failed = True
+		recorder.add("sse_delivery", args.sse_timeout, "timeout")
+	conn.close()
+	return user
+
+
+def seed(app, args) -> None:
+	from werkzeug.security import generate_password_hash
+	from sqlalchemy import insert
+	from app import db
+	from app.models import Role, User
+
+	password_hash = generate_password_hash(args.password)  # one hash for everyone keeps seeding fast
+	rows = [{"username": f"lt_user_{n}", "role": Role.USER, "balance": 1000} for n in range(args.participants)]
+	rows += [{"username": f"lt_manager_{n}", "role": Role.MANAGER, "balance": 0} for n in range(args.managers)]
+	rows += [{"username": f"lt_sse_{n}", "role": Role.USER, "balance": 0} for n in range(args.sse_users)]
+	for row in rows:
+		row.update(email=f"{row['username']}@example.com", password_hash=password_hash)
+	with app.app_context():
+		db.session.execute(insert(User), rows)
+		db.session.commit()
+		ids = dict(db.session.query(User.username, User.id).filter(User.username.like("lt_sse_%")).all())
+	args.sse_user_ids = [ids[f"lt_sse_{n}"] for n in range(args.sse_users)]
+
+
+def start_local_server(args) -> str:
+	from werkzeug.serving import make_server
+
+	os.environ.setdefault("LOG_FILE", "")
+	os.environ.setdefault("LOG_LEVEL", "WARNING")
+	logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no access log line per request
+	app = make_app()
+	app.config["TESTING"] = False
+	seed(app, args)
+	server = make_server("127.0.0.1", 0, app, threaded=True)
+	threading.Thread(target=server.serve_forever, name="load-test-server", daemon=True).start()
+	return f"http://127.0.0.1:{server.server_port}"
+
+
+def _stats(values: list[float]) -> dict:
+	if not values:
+		return {"min": None, "max": None, "average": None, "median": None, "p95": None, "p99": None}
+	ordered = sorted(values)
+
+	def pct(p: float) -> float:
+		return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+	return {
+		"min": ordered[0],
+		"max": ordered[-1],
+		"average": statistics.fmean(ordered),
+		"median": pct(50),
+		"p95": pct(95),
+		"p99": pct(99),
+	}
+
+
+def _group(users: list[VirtualUser]) -> dict:
+	per_user = [statistics.fmean(u.timings) for u in users if u.timings]
+	stats = _stats(per_user)
+	successful = sum(1 for u in users if not u.failed)
+	return {
+		"count": len(users),
+		"successful": successful,
+		"failed": len(users) - successful,
+		"success_rate": 100.0 * successful / len(users) if users else 100.0,
+		"avg_response_time": stats["average"],
+		"median_response_time": stats["median"],
+		"p95_response_time": stats["p95"],
+	}
+
+
+def rating(p95: float | None) -> str:
+	if p95 is None:
+		return "UNKNOWN - No requests completed"
+	if p95 < 0.5:
+		return "EXCELLENT - Ready for production"
+	if p95 < 1.0:
+		return "GOOD - Minor optimizations possible"
+	if p95 < 3.0:
+		return "FAIR - Optimizations recommended"
+	return "POOR - Needs optimization"
+
+
+def run(args) -> dict:
+	base_url = args.url or start_local_server(args)
+	recorder = Recorder()
+	plan = (
+		[("light", light_user, n) for n in range(args.light_users)]
+		+ [("active", active_user, n) for n in range(args.active_users)]
+		+ [("manager", manager_user, n) for n in range(args.manager_users)]
+		+ [("sse", sse_user, n) for n in range(args.sse_users)]
+	)
+	random.Random(args.seed).shuffle(plan)
+	results: dict[str, list[VirtualUser]] = defaultdict(list)
+
+	started = time.perf_counter()
+	with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+		futures = [(kind, pool.submit(fn, base_url, recorder, n, args)) for kind, fn, n in plan]
+		for kind, future in futures:
+			results[kind].append(future.result())
+	total_time = time.perf_counter() - started
+
+	everyone = [u for users in results.values() for u in users]
+	successful = sum(1 for u in everyone if not u.failed)
+	overall = _stats(recorder.samples)
+	active = results["active"] + results["manager"] + results["sse"]
+	return {
+		"test_summary": {
+			"total_users": len(everyone),
+			"light_users": len(results["light"]),
+			"active_users": len(active),
+			"successful_users": successful,
+			"failed_users": len(everyone) - successful,
+			"success_rate": 100.0 * successful / len(everyone) if everyone else 100.0,
+			"total_test_time": total_time,
+			"total_requests": len(recorder.samples),
+			"requests_per_second": len(recorder.samples) / total_time if total_time else 0.0,
+		},
+		"light_users": _group(results["light"]),
+		"active_users": _group(active),
+		"overall_response_times": overall,
+		"status_codes": dict(sorted(recorder.status_codes.items())),
+		"scenarios": {step: {"count": len(values), **_stats(values)} for step, values in sorted(recorder.by_step.items())},
+		"performance_rating": rating(overall["p95"]),
+		"metadata": {
+			"target": args.url or f"local ({os.environ.get('BENCH_DATABASE_URL') or 'sqlite'})",
+			"concurrency": args.concurrency,
+			"seed": args.seed,
+			"timestamp": time.time(),
+			"python": sys.version.split()[0],
+		},
+	}
+
+
+# (path, higher_is_better) for the numbers compared against the baseline
+_COMPARED = [
+	(("test_summary", "success_rate"), True),
+	(("test_summary", "requests_per_second"), True),
+	(("overall_response_times", "median"), False),
+	(("overall_response_times", "p95"), False),
+	(("overall_response_times", "p99"), False),
+	(("light_users", "p95_response_time"), False),
+	(("active_users", "p95_response_time"), False),
+]
+
+
+def diff_against_baseline(results: dict, baseline: dict, tolerance: float) -> list[str]:
+	"""Print a comparison table; return the metrics that regressed beyond `tolerance` (fraction)."""
+	compared = list(_COMPARED)
+	for step in sorted(set(results.get("scenarios", {})) & set(baseline.get("scenarios", {}))):
+		compared.append((("scenarios", step, "p95"), False))
+
+	regressions = []
+	print(f"\n{'metric':40s} {'baseline':>12s} {'current':>12s} {'change':>9s}")
+	for path, higher_is_better in compared:
+		old, new = baseline, results
+		for key in path:
+			old = (old or {}).get(key)
+			new = (new or {}).get(key)
+		if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+			continue
+		change = (new - old) / old if old else 0.0
+		worse = change < -tolerance if higher_is_better else change > tolerance
+		name = ".".join(path)
+		flag = "  REGRESSION" if worse else ""
+		print(f"{name:40s} {old:12.4f} {new:12.4f} {change * 100:+8.1f}%{flag}")
+		if worse:
+			regressions.append(name)
+	return regressions
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--url", help="target an already running deployment instead of a local app")
+	parser.add_argument("--users", type=int, default=200, help="virtual users in total")
+	parser.add_argument("--light-fraction", type=float, default=0.3)
+	parser.add_argument("--manager-fraction", type=float, default=0.1)
+	parser.add_argument("--sse-users", type=int, default=10)
+	parser.add_argument("--concurrency", type=int, default=50)
+	parser.add_argument("--rounds", type=int, default=3, help="credit/debit pairs per manager user")
+	parser.add_argument("--participants", type=int, default=100)
+	parser.add_argument("--managers", type=int, default=10)
+	parser.add_argument("--password", default="loadtest-password")
+	parser.add_argument("--sse-timeout", type=float, default=10.0)
+	parser.add_argument("--seed", type=int, default=1)
+	parser.add_argument("--output", default=DEFAULT_OUTPUT)
+	parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+	parser.add_argument("--save-baseline", action="store_true", help="write this run to --baseline")
+	parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change before flagging")
+	parser.add_argument("--fail-on-regression", action="store_true")
+	args = parser.parse_args()
+	if args.url and args.sse_users:
+		print("SSE scenario skipped: it only runs against the local app")
+		args.sse_users = 0
+
+	regular = max(args.users - args.sse_users, 0)
+	args.light_users = int(regular * args.light_fraction)
+	args.manager_users = int(regular * args.manager_fraction)
+	args.active_users = regular - args.light_users - args.manager_users
+	args.sse_user_ids = list(range(args.sse_users))
+
+	results = run(args)
+	summary = results["test_summary"]
+	overall = results["overall_response_times"]
+	print(
+		f"users={summary['total_users']} requests={summary['total_requests']} "
+		f"rps={summary['requests_per_second']:.1f} success={summary['success_rate']:.1f}% "
+		f"median={overall['median']:.3f}s p95={overall['p95']:.3f}s p99={overall['p99']:.3f}s"
+	)
+	for step, stats in results["scenarios"].items():
+		print(f"  {step:20s} n={stats['count']:5d} median={stats['median']:.3f}s p95={stats['p95']:.3f}s")
+	print(results["performance_rating"])
+
+	os.makedirs(os.path.dirname(args.output), exist_ok=True)
+	with open(args.output, "w") as fh:
+		json.dump(results, fh, indent=2)
+	print(f"results: {args.output}")
+
+	if args.save_baseline:
+		os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+		with open(args.baseline, "w") as fh:
+			json.dump(results, fh, indent=2)
+		print(f"baseline saved: {args.baseline}")
+		return 0
+	if not os.path.exists(args.baseline):
+		print(f"no baseline at {args.baseline}; run with --save-baseline to create one")
+		return 0
+	with open(args.baseline) as fh:
+		regressions = diff_against_baseline(results, json.load(fh), args.tolerance)
+	if regressions:
+		print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+		return 1 if args.fail_on_regression else 0
+	print("\nno regressions against the baseline")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+What logging costs per request: time GET /dashboard (one debug line per
+request) with debug logging gated off, through the queue pipeline, and
+through a synchronous file handler like the one it replaced. --slow-io-ms
+adds a delay to every file write to show what a slow disk does to each.
+
+	python benchmarks/logging_cost.py --iterations 1000 --slow-io-ms 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+
+from common import make_app, create_user, login, time_calls, summarize, write_results
+
+
+class SlowFileHandler(RotatingFileHandler):
+	def __init__(self, path: str, delay_ms: float) -> None:
+		super().__init__(path, maxBytes=50_000_000, backupCount=1)
+		self.delay_ms = delay_ms
+
+	def emit(self, record: logging.LogRecord) -> None:
+		if self.delay_ms:
+			time.sleep(self.delay_ms / 1000.0)
+		super().emit(record)
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--iterations", type=int, default=1000)
+	parser.add_argument("--slow-io-ms", type=float, default=0.0)
+	args = parser.parse_args()
+
+	log_dir = tempfile.mkdtemp(prefix="wallet-logging-")
+	os.environ["LOG_FILE"] = ""
+	app = make_app()
+	from app.logging_utils import JsonFormatter, PidQueueHandler, RequestIdFilter
+
+	with app.app_context():
+		create_user("viewer", balance=10)
+	client = app.test_client()
+	login(client, "viewer")
+
+	def file_handler(name: str) -> logging.Handler:
+		handler = SlowFileHandler(os.path.join(log_dir, f"{name}.log"), args.slow_io_ms)
+		handler.setFormatter(JsonFormatter())
+		return handler
+
+	def use(handler: logging.Handler, level: int) -> None:
+		for old in list(app.logger.handlers):
+			app.logger.removeHandler(old)
+			if isinstance(old, PidQueueHandler):
+				old.stop()
+		handler.addFilter(RequestIdFilter())
+		app.logger.addHandler(handler)
+		app.logger.setLevel(level)
+
+	variants = {
+		"debug_gated_off": lambda: use(PidQueueHandler([file_handler("gated")]), logging.INFO),
+		"queue_pipeline": lambda: use(PidQueueHandler([file_handler("queue")]), logging.DEBUG),
+		"synchronous_file": lambda: use(file_handler("sync"), logging.DEBUG),
+	}
+	results = {}
+	for name, configure in variants.items():
+		configure()
+		results[name] = summarize(time_calls(lambda: client.get("/dashboard"), args.iterations, warmup=20))
+		print(f"{name:18s} median={results[name]['median_ms']:.3f}ms p95={results[name]['p95_ms']:.3f}ms")
+
+	base = results["debug_gated_off"]["median_ms"]
+	for name in ("queue_pipeline", "synchronous_file"):
+		results[name]["cost_per_request_us"] = (results[name]["median_ms"] - base) * 1000
+		print(f"{name:18s} logging cost={results[name]['cost_per_request_us']:.0f}us/request")
+	results["slow_io_ms"] = args.slow_io_ms
+	use(logging.NullHandler(), logging.INFO)  # stops the last queue listener
+	print(f"results: {write_results('logging_cost', results)}")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
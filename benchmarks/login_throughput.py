@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Login storm against a gevent server set up like a production worker:
+--logins POST /auth/login requests, --concurrency at a time, while a probe
+keeps requesting the landing page. With hashing inline
+(PASSWORD_HASH_THREADS=0) every hash blocks the worker's hub, so the probe
+queues behind the logins; on the hash pool the hub keeps serving it.
+
+	python benchmarks/login_throughput.py --logins 200 --concurrency 50
+"""
+
+import sys
+
+if __name__ == "__main__" and "--serve" in sys.argv:
+	# The server process must patch before anything else is imported
+	from gevent import monkey
+	monkey.patch_all()
+
+import argparse
+import os
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from common import make_app, summarize, write_results
+
+PASSWORD = "storm-password"
+
+
+def serve(users: int) -> None:
+	"""Child process: seed `users` accounts, print the port, serve forever."""
+	from gevent.pywsgi import WSGIServer
+	from sqlalchemy import insert
+
+	os.environ["LOG_FILE"] = ""
+	os.environ["LOG_LEVEL"] = "WARNING"
+	app = make_app()
+	app.config["TESTING"] = False
+	from app import db
+	from app.models import Role, User
+	from app.passwords import hash_password
+
+	with app.app_context():
+		password_hash = hash_password(PASSWORD)
+		db.session.execute(insert(User), [
+			{"username": f"storm{n}", "email": f"storm{n}@example.com", "password_hash": password_hash, "role": Role.USER, "balance": 0}
+			for n in range(users)
+		])
+		db.session.commit()
+	server = WSGIServer(("127.0.0.1", 0), app, log=None)
+	server.start()
+	print(server.server_port, flush=True)
+	server.serve_forever()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+	def redirect_request(self, *args, **kwargs):
+		return None
+
+
+def _timed_post(url: str, data: dict) -> tuple[float, int]:
+	opener = urllib.request.build_opener(_NoRedirect())
+	started = time.perf_counter()
+	try:
+		with opener.open(url, data=urllib.parse.urlencode(data).encode(), timeout=120) as response:
+			response.read()
+			status = response.status
+	except urllib.error.HTTPError as e:
+		status = e.code
+	return (time.perf_counter() - started) * 1000.0, status
+
+
+def run_variant(threads: int, args) -> dict:
+	env = dict(os.environ, PASSWORD_HASH_THREADS=str(threads))
+	proc = subprocess.Popen(
+		[sys.executable, os.path.abspath(__file__), "--serve", "--logins", str(args.logins)],
+		env=env, stdout=subprocess.PIPE, text=True,
+	)
+	try:
+		base = f"http://127.0.0.1:{int(proc.stdout.readline())}"
+		probe_samples: list[float] = []
+		done = threading.Event()
+
+		def probe() -> None:
+			while not done.is_set():
+				started = time.perf_counter()
+				with urllib.request.urlopen(base + "/", timeout=120) as response:
+					response.read()
+				probe_samples.append((time.perf_counter() - started) * 1000.0)
+				time.sleep(0.02)
+
+		prober = threading.Thread(target=probe, daemon=True)
+		prober.start()
+		started = time.perf_counter()
+		with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+			results = list(pool.map(
+				lambda n: _timed_post(base + "/auth/login", {"username": f"storm{n}", "password": PASSWORD}),
+				range(args.logins),
+			))
+		elapsed = time.perf_counter() - started
+		done.set()
+		prober.join()
+	finally:
+		proc.terminate()
+		proc.wait()
+
+	failures = sum(1 for _, status in results if status != 302)
+	return {
+		"hash_threads": threads,
+		"logins_per_second": args.logins / elapsed,
+		"failed_logins": failures,
+		"login": summarize([ms for ms, _ in results]),
+		"probe_during_storm": summarize(probe_samples),
+	}
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--logins", type=int, default=200)
+	parser.add_argument("--concurrency", type=int, default=50)
+	parser.add_argument("--threads", type=int, default=4, help="PASSWORD_HASH_THREADS for the pooled run")
+	parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+	args = parser.parse_args()
+	if args.serve:
+		serve(args.logins)
+		return 0
+
+	results = {}
+	for name, threads in (("inline", 0), ("pooled", args.threads)):
+		results[name] = run_variant(threads, args)
+		r = results[name]
+		print(
+			f"{name:7s} logins/s={r['logins_per_second']:.1f} failed={r['failed_logins']} "
+			f"login p50={r['login']['median_ms']:.0f}ms p95={r['login']['p95_ms']:.0f}ms "
+			f"probe p50={r['probe_during_storm']['median_ms']:.1f}ms p95={r['probe_during_storm']['p95_ms']:.1f}ms"
+		)
+	print(f"results: {write_results('login_throughput', results)}")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
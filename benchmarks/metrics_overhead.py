@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Per-request cost of the Prometheus hooks: time the same authenticated
+request with METRICS_ENABLED=0 and =1 (each in a fresh process, since the
+flag is read when the app is created), in single-process and multiprocess
+(PROMETHEUS_MULTIPROC_DIR) mode.
+
+	python benchmarks/metrics_overhead.py --iterations 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+
+from common import make_app, create_user, login, time_calls, summarize, write_results
+
+
+def _run(env: dict, iterations: int, queue) -> None:
+	os.environ.update(env)
+	app = make_app()
+	with app.app_context():
+		create_user("viewer", balance=10)
+	client = app.test_client()
+	login(client, "viewer")
+	queue.put(summarize(time_calls(lambda: client.get("/qr/viewer"), iterations, warmup=50)))
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--iterations", type=int, default=2000)
+	args = parser.parse_args()
+
+	variants = {
+		"metrics_off": {"METRICS_ENABLED": "0"},
+		"metrics_on": {"METRICS_ENABLED": "1"},
+		"metrics_on_multiprocess": {"METRICS_ENABLED": "1", "PROMETHEUS_MULTIPROC_DIR": tempfile.mkdtemp(prefix="wallet-metrics-")},
+	}
+	ctx = multiprocessing.get_context("spawn")
+	results = {}
+	for name, env in variants.items():
+		queue = ctx.Queue()
+		proc = ctx.Process(target=_run, args=(env, args.iterations, queue))
+		proc.start()
+		results[name] = queue.get()
+		proc.join()
+		print(f"{name:24s} median={results[name]['median_ms']:.3f}ms p95={results[name]['p95_ms']:.3f}ms")
+
+	base = results["metrics_off"]["median_ms"]
+	for name in ("metrics_on", "metrics_on_multiprocess"):
+		results[name]["overhead_median_ms"] = results[name]["median_ms"] - base
+		print(f"{name:24s} overhead={results[name]['overhead_median_ms'] * 1000:.0f}us/request")
+	print(f"results: {write_results('metrics_overhead', results)}")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the hot helpers, each in its own process with a fresh
+app and database:
+
+  change_balance      wallet.change_balance, credit and rejected debit
+  log_event           audit.log_event in each AUDIT_MODE, through to the database
+  qr_data_uri         wallet.generate_qr_data_uri
+  password            models.generate_password_from_name + generate_password_hash
+  load_user           the Flask-Login user loader, identity cache off and on
+  username_lookup     User.query.filter_by(username=) against usernames.find_user
+                      and find_user_id (per-worker map) among 5000 users
+  bulk_import_rows    the bulk-import row loops: read_participants on a CSV
+                      upload, create_participants (one worker, no email) and
+                      create_participants on rows that all exist already
+
+Results go to benchmarks/results/microbench.json; --compare takes an earlier
+copy of that file and prints the median change per benchmark.
+
+	python benchmarks/microbench.py --iterations 500
+	python benchmarks/microbench.py --only change_balance,load_user --compare before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from queue import Empty
+
+from common import make_app, create_user, time_calls, summarize, write_results
+
+
+def bench_change_balance(iterations: int) -> dict:
+	app = make_app()
+	from flask_login import login_user
+	from app.models import Role
+	from app.wallet import change_balance
+
+	results = {}
+	with app.app_context():
+		manager = create_user("stall", role=Role.MANAGER)
+		participant = create_user("participant", balance=0)
+		broke = create_user("broke", balance=0)
+		with app.test_request_context():
+			login_user(manager)
+			results["credit"] = summarize(time_calls(lambda: change_balance(participant, 1, reason="bench"), iterations))
+			results["insufficient_funds"] = summarize(time_calls(lambda: change_balance(broke, -1, reason="bench"), iterations))
+	return results
+
+
+def bench_log_event(iterations: int) -> dict:
+	app = make_app()
+	from app import db
+	from app.audit import log_event
+
+	results = {}
+	with app.app_context():
+		with app.test_request_context():
+			for mode in ("sync", "transaction", "batch"):
+				app.config["AUDIT_MODE"] = mode
+				if mode == "transaction":
+					# Buffered until the business transaction commits
+					def call():
+						log_event("bench", resource="bench", meta="delta=1")
+						db.session.commit()
+				else:
+					def call():
+						log_event("bench", resource="bench", meta="delta=1")
+				results[mode] = summarize(time_calls(call, iterations))
+			app.extensions["audit_writer"].stop()
+	return results
+
+
+def bench_qr_data_uri(iterations: int) -> dict:
+	app = make_app()
+	from app.wallet import generate_qr_data_uri
+
+	with app.app_context():
+		user = create_user("qr_participant_with_a_long_name")
+		return {"generate_qr_data_uri": summarize(time_calls(lambda: generate_qr_data_uri(user), iterations))}
+
+
+def bench_password(iterations: int) -> dict:
+	app = make_app()
+	from werkzeug.security import generate_password_hash
+	from app.models import generate_password_from_name
+
+	with app.app_context():
+		iterations = max(10, iterations // 20)  # hashing is deliberately slow
+		return {
+			"generate_password_from_name": summarize(time_calls(lambda: generate_password_from_name("Jane Participant"), iterations * 20)),
+			"name_and_hash": summarize(time_calls(lambda: generate_password_hash(generate_password_from_name("Jane Participant")), iterations, warmup=1)),
+		}
+
+
+def bench_load_user(iterations: int) -> dict:
+	# The identity cache is only used with a backend every worker shares
+	os.environ["CACHE_TYPE"] = "FileSystemCache"
+	os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="wallet-bench-cache-")
+	app = make_app()
+	from app import load_user
+
+	results = {}
+	with app.app_context():
+		user_id = str(create_user("viewer", balance=10).id)
+		for label, ttl in (("uncached", 0), ("cached", 30)):
+			app.config["IDENTITY_CACHE_TTL"] = ttl
+			results[label] = summarize(time_calls(lambda: load_user(user_id), iterations))
+	return results
+
+
+def bench_username_lookup(iterations: int, users: int = 5000) -> dict:
+	app = make_app()
+	from sqlalchemy import insert
+	from app import db
+	from app.models import User
+	from app.usernames import find_user, find_user_id, username_map
+
+	with app.app_context():
+		db.session.execute(insert(User), [
+			{"username": f"Participant{n}", "email": None, "password_hash": "x"} for n in range(users)
+		])
+		db.session.commit()
+		username_map.warm()
+		names = [f"Participant{n}" for n in range(0, users, max(1, users // 100))]
+
+		def lookup(fn):
+			position = [0]
+
+			def call():
+				position[0] = (position[0] + 1) % len(names)
+				fn(names[position[0]])
+				db.session.expunge_all()  # each request starts with an empty session
+			return call
+
+		return {
+			"filter_by_exact": summarize(time_calls(lookup(lambda name: User.query.filter_by(username=name).first()), iterations)),
+			"find_user": summarize(time_calls(lookup(find_user), iterations)),
+			"find_user_id": summarize(time_calls(lookup(find_user_id), iterations)),
+		}
+
+
+def bench_bulk_import_rows(iterations: int, rows: int = 1000, created_rows: int = 20) -> dict:
+	app = make_app()
+	from sqlalchemy import insert
+	from werkzeug.datastructures import FileStorage
+	from app import db
+	from app.bulk_import import create_participants, read_participants
+	from app.models import User
+
+	app.config["BULK_IMPORT_WORKERS"] = 1
+	app.root_path = tempfile.mkdtemp(prefix="wallet-bench-root-")  # QR files land here
+	lines = ["Name,Email"] + [f"Participant {n},participant{n}@example.com" for n in range(rows)]
+	csv_bytes = ("\n".join(lines) + "\n").encode()
+
+	def read():
+		upload = FileStorage(stream=io.BytesIO(csv_bytes), filename="participants.csv", content_type="text/csv")
+		return read_participants(upload)
+
+	batch = [0]
+
+	def create():
+		batch[0] += 1
+		create_participants([
+			{"username": f"b{batch[0]}_{n}", "email": None, "password": f"b{batch[0]}_{n}1234"}
+			for n in range(created_rows)
+		])
+
+	# A stale preview of accounts that already exist: the loops and chunked
+	# existence checks without any hashing or inserts
+	existing = [{"username": f"existing{n}", "email": f"existing{n}@example.com", "password": "x"} for n in range(rows)]
+
+	results = {}
+	with app.app_context():
+		db.session.execute(insert(User), [{"username": p["username"], "email": p["email"], "password_hash": "x"} for p in existing])
+		db.session.commit()
+		results["read_participants"] = summarize(time_calls(read, max(5, iterations // 50), warmup=1))
+		results["read_participants"]["per_row_us"] = results["read_participants"]["median_ms"] * 1000 / rows
+		results["create_participants"] = summarize(time_calls(create, max(3, iterations // 200), warmup=1))
+		results["create_participants"]["per_row_us"] = results["create_participants"]["median_ms"] * 1000 / created_rows
+		results["create_participants_all_existing"] = summarize(time_calls(lambda: create_participants(existing), max(5, iterations // 50), warmup=1))
+		results["create_participants_all_existing"]["per_row_us"] = results["create_participants_all_existing"]["median_ms"] * 1000 / rows
+	return results
+
+
+BENCHMARKS = {
+	"change_balance": bench_change_balance,
+	"log_event": bench_log_event,
+	"qr_data_uri": bench_qr_data_uri,
+	"password": bench_password,
+	"load_user": bench_load_user,
+	"username_lookup": bench_username_lookup,
+	"bulk_import_rows": bench_bulk_import_rows,
+}
+
+
+def _run(name: str, iterations: int, queue) -> None:
+	os.environ["LOG_FILE"] = ""
+	queue.put(BENCHMARKS[name](iterations))
+
+
+def _collect(proc, queue) -> dict | None:
+	"""The child's results, or None if it exited without sending any."""
+	while True:
+		try:
+			return queue.get(timeout=1)
+		except Empty:
+			if not proc.is_alive():
+				# A last put may still be in flight
+				try:
+					return queue.get(timeout=1)
+				except Empty:
+					return None
+
+
+def compare(results: dict, previous: dict) -> None:
+	print(f"\n{'benchmark':50s} {'before':>10s} {'after':>10s} {'change':>9s}")
+	for name, variants in results.items():
+		for variant, stats in variants.items():
+			old = previous.get(name, {}).get(variant, {}).get("median_ms")
+			if not old:
+				continue
+			new = stats["median_ms"]
+			print(f"{name + '.' + variant:50s} {old:9.3f}ms {new:9.3f}ms {(new - old) / old * 100:+8.1f}%")
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--iterations", type=int, default=500)
+	parser.add_argument("--only", help="comma-separated benchmark names")
+	parser.add_argument("--compare", help="earlier microbench.json to compare medians against")
+	args = parser.parse_args()
+
+	names = args.only.split(",") if args.only else list(BENCHMARKS)
+	unknown = [n for n in names if n not in BENCHMARKS]
+	if unknown:
+		parser.error(f"unknown benchmark(s): {', '.join(unknown)}; choose from {', '.join(BENCHMARKS)}")
+
+	ctx = multiprocessing.get_context("spawn")
+	results = {}
+	failed = []
+	for name in names:
+		queue = ctx.Queue()
+		proc = ctx.Process(target=_run, args=(name, args.iterations, queue))
+		proc.start()
+		outcome = _collect(proc, queue)
+		proc.join()
+		if outcome is None:
+			# The child's traceback is already on stderr
+			print(f"{name}: failed (exit code {proc.exitcode})", file=sys.stderr)
+			failed.append(name)
+			continue
+		results[name] = outcome
+		for variant, stats in results[name].items():
+			print(f"{name + '.' + variant:50s} median={stats['median_ms']:.3f}ms p95={stats['p95_ms']:.3f}ms n={stats['count']}")
+
+	if args.compare:
+		with open(args.compare) as fh:
+			compare(results, json.load(fh).get("results", {}))
+	print(f"results: {write_results('microbench', results)}")
+	if failed:
+		print(f"failed: {', '.join(failed)}", file=sys.stderr)
+		return 1
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Latency of one scan-and-charge at a stall: the form flow (POST
+/manager/update-balance, 302, GET /dashboard rendering
+manager_dashboard.html) against one POST /api/v1/scan, plus a lookup-only
+scan. Counts SQL statements per scan as well.
+
+	python benchmarks/scan_latency.py --iterations 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from common import make_app, create_user, login, time_calls, summarize, write_results
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--iterations", type=int, default=500)
+	args = parser.parse_args()
+
+	app = make_app()
+	from sqlalchemy import event
+	from app import db
+	from app.models import Role
+
+	with app.app_context():
+		create_user("stall", role=Role.MANAGER)
+		create_user("participant", balance=1_000_000)
+		engine = db.engine
+	statements = []
+	event.listen(engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+
+	client = app.test_client()
+	login(client, "stall")
+
+	def form_flow() -> None:
+		response = client.post("/manager/update-balance", data={"username": "participant", "action": "deduct", "amount": 1}, follow_redirects=True)
+		assert response.status_code == 200
+
+	def scan_charge() -> None:
+		response = client.post("/api/v1/scan", json={"payload": "participant", "delta": -1})
+		assert response.json["applied"], response.json
+
+	def scan_lookup() -> None:
+		response = client.post("/api/v1/scan", json={"payload": "participant"})
+		assert response.status_code == 200
+
+	results = {}
+	for name, fn in (("form_post_redirect_get", form_flow), ("api_scan_charge", scan_charge), ("api_scan_lookup", scan_lookup)):
+		fn()
+		statements.clear()
+		fn()
+		queries = len(statements)
+		results[name] = {"queries": queries, **summarize(time_calls(fn, args.iterations))}
+		print(f"{name:24s} queries={queries:2d} median={results[name]['median_ms']:.2f}ms p95={results[name]['p95_ms']:.2f}ms")
+
+	base = results["form_post_redirect_get"]["median_ms"]
+	for name in results:
+		results[name]["speedup"] = base / results[name]["median_ms"]
+	print(f"results: {write_results('scan_latency', results)}")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
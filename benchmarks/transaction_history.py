@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Time /api/transactions pages at increasing cursor depth, next to the same
+page fetched with LIMIT/OFFSET, for one user with a long history.
+Keyset times are whole requests; OFFSET times are the query alone.
+
+	python benchmarks/transaction_history.py --transactions 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from common import make_app, create_user, login, time_calls, summarize, write_results
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--transactions", type=int, default=100_000)
+	parser.add_argument("--limit", type=int, default=100)
+	parser.add_argument("--iterations", type=int, default=50)
+	args = parser.parse_args()
+
+	app = make_app()
+	from sqlalchemy import event, insert, select
+	from sqlalchemy.orm import aliased
+	from app import db
+	from app.models import User, WalletTransaction, Role
+	from app.routes import _encode_history_cursor
+
+	with app.app_context():
+		user = create_user("history", balance=0)
+		stall = create_user("stall", role=Role.MANAGER)
+		start = datetime(2026, 1, 1)
+		rows = [
+			{
+				"user_id": user.id,
+				"change_amount": 1,
+				"balance_after": i + 1,
+				"performed_by_id": stall.id,
+				"reason": "bench",
+				"created_at": start + timedelta(seconds=i),
+			}
+			for i in range(args.transactions)
+		]
+		for offset in range(0, len(rows), 5000):
+			db.session.execute(insert(WalletTransaction), rows[offset:offset + 5000])
+		db.session.commit()
+		# (created_at, id) of every row in page order, to build cursors at any depth
+		order = db.session.execute(
+			select(WalletTransaction.created_at, WalletTransaction.id)
+			.where(WalletTransaction.user_id == user.id)
+			.order_by(WalletTransaction.created_at.desc(), WalletTransaction.id.desc())
+		).all()
+		engine = db.engine
+
+	client = app.test_client()
+	login(client, "history")
+	statements = []
+	event.listen(engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+
+	performer = aliased(User)
+	results = {}
+	for fraction in (0.0, 0.5, 0.99):
+		depth = int(len(order) * fraction)
+		url = f"/api/transactions?limit={args.limit}"
+		if depth:
+			url += f"&cursor={_encode_history_cursor(*order[depth - 1])}"
+		assert client.get(url).json["count"] == min(args.limit, len(order) - depth)
+		statements.clear()
+		keyset = summarize(time_calls(lambda: client.get(url), args.iterations))
+		queries = len(statements) / (args.iterations + 5)
+
+		def offset_page():
+			with app.app_context():
+				db.session.execute(
+					select(WalletTransaction, performer.username)
+					.outerjoin(performer, performer.id == WalletTransaction.performed_by_id)
+					.where(WalletTransaction.user_id == user.id)
+					.order_by(WalletTransaction.created_at.desc(), WalletTransaction.id.desc())
+					.offset(depth).limit(args.limit)
+				).all()
+
+		offset = summarize(time_calls(offset_page, args.iterations))
+		results[f"depth_{depth}"] = {"queries_per_page": queries, "keyset": keyset, "offset": offset}
+		print(f"depth={depth:7d} keyset median={keyset['median_ms']:.2f}ms ({queries:.1f} queries)  offset median={offset['median_ms']:.2f}ms")
+
+	print(f"results: {write_results('transaction_history', results)}")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Hammer one participant's wallet from many threads at once and check that
+no update is lost and the balance never goes negative.
+
+	python benchmarks/wallet_concurrency.py --threads 16 --iterations 50
+
+Exits non-zero when the final balance or the ledger disagrees with the
+number of successful calls.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+import time
+
+from common import make_app, create_user
+
+
+def hammer(app, user_id: int, threads: int, iterations: int, delta: int) -> list[bool]:
+	from app.models import User
+	from app.wallet import change_balance
+	from app import db
+
+	results: list[bool] = []
+	results_lock = threading.Lock()
+	start = threading.Barrier(threads)
+
+	def worker():
+		start.wait()
+		for _ in range(iterations):
+			with app.test_request_context():
+				user = db.session.get(User, user_id)
+				_, success, _ = change_balance(user, delta, reason="concurrency_check")
+				with results_lock:
+					results.append(success)
+
+	pool = [threading.Thread(target=worker) for _ in range(threads)]
+	for t in pool:
+		t.start()
+	for t in pool:
+		t.join()
+	return results
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--threads", type=int, default=16)
+	parser.add_argument("--iterations", type=int, default=50)
+	args = parser.parse_args()
+
+	app = make_app()
+	from app import db
+	from app.models import User, WalletTransaction
+
+	with app.app_context():
+		user_id = create_user("hammered", balance=0).id
+
+	started = time.perf_counter()
+	credits = hammer(app, user_id, args.threads, args.iterations, 1)
+	credited = sum(credits)
+	# Ask for twice what is available: exactly `credited` debits may succeed
+	debits = hammer(app, user_id, args.threads, args.iterations * 2, -1)
+	debited = sum(debits)
+	elapsed = time.perf_counter() - started
+
+	with app.app_context():
+		balance = db.session.get(User, user_id).balance
+		ledger = WalletTransaction.query.filter_by(user_id=user_id).all()
+		ledger_sum = sum(tr.change_amount for tr in ledger)
+
+	expected_balance = credited - debited
+	print(f"threads={args.threads} calls={len(credits) + len(debits)} elapsed={elapsed:.2f}s")
+	print(f"credits ok={credited}/{len(credits)} debits ok={debited}/{len(debits)}")
+	print(f"balance={balance} expected={expected_balance} ledger_sum={ledger_sum} ledger_rows={len(ledger)}")
+
+	ok = (
+		credited == len(credits)
+		and debited == credited
+		and balance == expected_balance == 0
+		and ledger_sum == balance
+		and len(ledger) == credited + debited
+	)
+	print("OK" if ok else "FAILED: lost or phantom updates detected")
+	return 0 if ok else 1
+
+
+if __name__ == "__main__":
+	sys.exit(main())
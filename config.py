@@ -39,14 +39,101 @@ class Config:
 	SMTP_USER = os.environ.get("SMTP_USER") or os.environ.get("EMAIL_USER")
 	SMTP_PASS = os.environ.get("SMTP_PASS") or os.environ.get("EMAIL_PASSWORD")
 	FROM_EMAIL = os.environ.get("FROM_EMAIL") or os.environ.get("EMAIL_USER", "noreply@example.com")
+	# Password hashing: a werkzeug method such as "scrypt:32768:8:1" or
+	# "pbkdf2:sha256:600000"; hashes made with other parameters are upgraded on
+	# the next login. Hashing runs on PASSWORD_HASH_THREADS native threads per
+	# worker (0 = inline on the request)
+	PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+	PASSWORD_SALT_LENGTH = int(os.environ.get("PASSWORD_SALT_LENGTH", 16))
+	PASSWORD_HASH_THREADS = int(os.environ.get("PASSWORD_HASH_THREADS", 4))
+
 	# Admin seed
 	ADMIN_USERNAME = os.environ.get("ADMIN_USERNAME", "admin")
 	ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "Admin1234")
 	ADMIN_EMAIL = os.environ.get("ADMIN_EMAIL", "admin@example.com")
 	
-	# Caching configuration for performance
-	CACHE_TYPE = 'simple'
+	# Logging: level for the app logger (DEBUG enables the per-request debug
+	# lines), "json" or "text" lines on stderr, plus LOG_FILE unless empty
+	# (default: instance/logs/app.log)
+	LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+	LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+	LOG_FILE = os.environ.get("LOG_FILE")
+
+	# Caching configuration for performance. "simple" is private to each
+	# worker; run several workers against "RedisCache" (CACHE_REDIS_URL) or,
+	# on a single host, "FileSystemCache" (CACHE_DIR) so invalidations reach
+	# all of them. Defaults to RedisCache whenever a Redis URL is configured
+	CACHE_TYPE = os.environ.get("CACHE_TYPE") or (
+		"RedisCache" if (os.environ.get("CACHE_REDIS_URL") or os.environ.get("REDIS_URL")) else "simple"
+	)
 	CACHE_DEFAULT_TIMEOUT = 300
+	CACHE_KEY_PREFIX = os.environ.get("CACHE_KEY_PREFIX", "wallet:")
+	CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL") or os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+	CACHE_DIR = os.environ.get("CACHE_DIR", "/tmp/token_wallet_cache")
+	CACHE_THRESHOLD = int(os.environ.get("CACHE_THRESHOLD", 10000))
+
+	# Audit logging: "transaction" writes events with the business commit,
+	# "batch" uses a background multi-row writer (a crash may lose the last
+	# AUDIT_FLUSH_INTERVAL_MS of events), "sync" commits every event
+	AUDIT_MODE = os.environ.get("AUDIT_MODE", "transaction")
+	AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", 100))
+	AUDIT_FLUSH_INTERVAL_MS = int(os.environ.get("AUDIT_FLUSH_INTERVAL_MS", 500))
+
+	# Rendered QR images: in-memory LRU size plus an optional on-disk store
+	QR_CACHE_SIZE = int(os.environ.get("QR_CACHE_SIZE", 2048))
+	QR_CACHE_DIR = os.environ.get("QR_CACHE_DIR")
+
+	# Bulk import: rows per multi-row INSERT / email task, and processes used
+	# for password hashing and QR rendering (defaults to the CPU count)
+	BULK_IMPORT_CHUNK_SIZE = int(os.environ.get("BULK_IMPORT_CHUNK_SIZE", 500))
+	BULK_IMPORT_WORKERS = int(os.environ.get("BULK_IMPORT_WORKERS", 0)) or None
+
+	# Real-time balance events between workers: "memory" (single worker),
+	# "redis" or "postgres" (LISTEN/NOTIFY on the app database)
+	REALTIME_BROKER = os.environ.get("REALTIME_BROKER", "memory")
+	REALTIME_BROKER_URL = os.environ.get("REALTIME_BROKER_URL")
+	# Messages buffered per SSE connection, and seconds before an unread one is evicted
+	REALTIME_BUFFER_SIZE = int(os.environ.get("REALTIME_BUFFER_SIZE", 16))
+	REALTIME_IDLE_TIMEOUT = int(os.environ.get("REALTIME_IDLE_TIMEOUT", 90))
+
+	# Seconds a logged-in user's identity stays cached between requests (0 = off);
+	# only used with a shared CACHE_TYPE, so role changes reach every worker
+	IDENTITY_CACHE_TTL = int(os.environ.get("IDENTITY_CACHE_TTL", 30))
+
+	# Admin database monitor: seconds between background samples per worker
+	# (0 = sample on demand) and how many samples are kept for the trend chart
+	DB_MONITOR_INTERVAL = int(os.environ.get("DB_MONITOR_INTERVAL", 60))
+	DB_MONITOR_HISTORY = int(os.environ.get("DB_MONITOR_HISTORY", 120))
+
+	# Prometheus metrics at /metrics; with METRICS_TOKEN set, scrapes must send
+	# "Authorization: Bearer <token>", without it only local, unproxied scrapes are served
+	METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+	METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+	# Request profiling: admins send "X-Profile: 1", or a random fraction of
+	# requests (PROFILE_SAMPLE_RATE) is sampled every PROFILE_INTERVAL_MS
+	# on the "wall" or "cpu" clock; stacks are collected in PROFILE_DIR
+	PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "1").lower() not in ("0", "false", "no")
+	PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+	PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+	PROFILE_CLOCK = os.environ.get("PROFILE_CLOCK", "wall")
+	PROFILE_DIR = os.environ.get("PROFILE_DIR")
+
+	# Seconds a balance request's Idempotency-Key is remembered, and how long
+	# its result stays in the shared cache for fast replays
+	IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", 86400))
+	IDEMPOTENCY_CACHE_TTL = int(os.environ.get("IDEMPOTENCY_CACHE_TTL", 600))
+
+	# Most entries accepted by one POST /api/balance/batch
+	BALANCE_BATCH_MAX_ITEMS = int(os.environ.get("BALANCE_BATCH_MAX_ITEMS", 500))
+
+	# Largest page /api/users returns (also the default page size)
+	API_USERS_PAGE_SIZE = int(os.environ.get("API_USERS_PAGE_SIZE", 1000))
+	# Seconds an updated_since sync holds back recent changes: updated_at is
+	# stamped before commit, so a newer row may still be invisible
+	API_USERS_SYNC_LAG = int(os.environ.get("API_USERS_SYNC_LAG", 30))
+	# Largest page /api/transactions returns (also the default page size)
+	API_TRANSACTIONS_PAGE_SIZE = int(os.environ.get("API_TRANSACTIONS_PAGE_SIZE", 100))
 
 
 class ProductionConfig(Config):
@@ -56,6 +143,12 @@ class ProductionConfig(Config):
 class DevelopmentConfig(Config):
 	DEBUG = True
 	SQLALCHEMY_DATABASE_URI = os.environ.get("DEV_DATABASE_URL", "sqlite:///app_dev.db")
+	if SQLALCHEMY_DATABASE_URI.startswith("sqlite"):
+		# sqlite3 rejects the libpq connect_args above; wait on the file lock instead
+		SQLALCHEMY_ENGINE_OPTIONS = {
+			"pool_pre_ping": True,
+			"connect_args": {"timeout": 30},
+		}
 
 
 def get_config():
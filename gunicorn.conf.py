@@ -1,6 +1,21 @@
+import glob
 import multiprocessing
 import os
 
+# Workers write metrics here so /metrics can aggregate all of them. It must
+# exist before the app (and prometheus_client) is imported, which with
+# preload_app happens before any server hook runs. Samples left by a
+# previous master's workers would be summed in forever, so the default
+# directory starts empty; a custom one is the operator's to clear. The
+# marker keeps a HUP reload, which re-reads this file, from wiping live workers.
+DEFAULT_METRICS_DIR = "/tmp/wallet-metrics"
+metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", DEFAULT_METRICS_DIR)
+if metrics_dir == DEFAULT_METRICS_DIR and not os.environ.get("WALLET_METRICS_DIR_CLEARED"):
+	for stale in glob.glob(os.path.join(metrics_dir, "*.db")):
+		os.remove(stale)
+	os.environ["WALLET_METRICS_DIR_CLEARED"] = "1"
+os.makedirs(metrics_dir, exist_ok=True)
+
 # Optimized for Railway free tier (250 concurrent users)
 bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
 workers = int(os.environ.get("GUNICORN_WORKERS", 2))
@@ -19,4 +34,34 @@ errorlog = "-"
 loglevel = "info"
 
 
+def on_starting(server):
+	# With a per-process cache an invalidation only reaches the worker that made it
+	from app.caching import cache_is_shared
+	from config import get_config
+	cache_type = get_config().CACHE_TYPE
+	if server.cfg.workers > 1 and not cache_is_shared(cache_type):
+		server.log.warning(
+			"CACHE_TYPE=%s is private to each of the %d workers; other workers serve stale balances "
+			"and roles until their entries expire. Set CACHE_TYPE=RedisCache (or REDIS_URL).",
+			cache_type, server.cfg.workers,
+		)
+
+
+def child_exit(server, worker):
+	# Drop the exited worker's live gauges (pool, SSE connections) from the totals
+	try:
+		from prometheus_client import multiprocess
+	except ImportError:
+		return
+	multiprocess.mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+	# Drain batched audit events and queued log records before the worker goes away
+	from app.audit import shutdown_audit
+	from app.logging_utils import shutdown_logging
+	shutdown_audit()
+	shutdown_logging()
+
+
 
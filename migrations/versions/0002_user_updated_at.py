@@ -0,0 +1,34 @@
+"""add user.updated_at for incremental /api/users sync
+
+Revision ID: 0002_user_updated_at
+Revises: 0001_baseline
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_user_updated_at'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Existing rows start out as "last changed when created"
+    op.execute('UPDATE "user" SET updated_at = created_at')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_index('ix_user_updated_at_id', ['updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_updated_at_id')
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,25 @@
+"""composite index for keyset-paginated transaction history
+
+Revision ID: 0003_transaction_history_index
+Revises: 0002_user_updated_at
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_transaction_history_index'
+down_revision = '0002_user_updated_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('wallet_transaction', schema=None) as batch_op:
+        batch_op.create_index('ix_wallet_transaction_user_created_id', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('wallet_transaction', schema=None) as batch_op:
+        batch_op.drop_index('ix_wallet_transaction_user_created_id')
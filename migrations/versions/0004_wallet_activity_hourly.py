@@ -0,0 +1,35 @@
+"""hourly wallet activity rollups
+
+Revision ID: 0004_wallet_activity_hourly
+Revises: 0003_transaction_history_index
+Create Date: 2026-10-18 13:00:00.000000
+
+Populate existing history afterwards with `flask rollups rebuild`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_wallet_activity_hourly'
+down_revision = '0003_transaction_history_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases built by db.create_all() before this revision already have it
+    if sa.inspect(op.get_bind()).has_table('wallet_activity_hourly'):
+        return
+    op.create_table('wallet_activity_hourly',
+    sa.Column('hour', sa.DateTime(), nullable=False),
+    sa.Column('performed_by_id', sa.Integer(), nullable=False),
+    sa.Column('transactions', sa.Integer(), nullable=False),
+    sa.Column('credited', sa.Integer(), nullable=False),
+    sa.Column('debited', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('hour', 'performed_by_id')
+    )
+
+
+def downgrade():
+    op.drop_table('wallet_activity_hourly')
@@ -0,0 +1,26 @@
+"""functional index on lower(username)
+
+Revision ID: 0006_user_username_lower_index
+Revises: 0005_idempotency_keys
+Create Date: 2026-10-18 15:00:00.000000
+
+Not unique: existing accounts may differ only in case.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_user_username_lower_index'
+down_revision = '0005_idempotency_keys'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases built by db.create_all() since the model declared it already have it
+    op.create_index('ix_user_username_lower', 'user', [sa.text('lower(username)')], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_user_username_lower', table_name='user')